@@ -6,20 +6,49 @@ Created on Tue Mar 10 15:32:03 2020
 @author: mike
 """
 
-from ngrid import NGrid
+from ngrid import NGrid, np
+import instrument
 import itertools as it
+from array import array
+from collections import OrderedDict
+from operator import add, mul
+
+
+# Neighbour tables are shared between boards with the same
+# (size, adjacency, boundary), keeping at most TABLE_CACHE_SIZE of them and evicting the least recently used
+TABLE_CACHE_SIZE = 8
+_neighbour_tables = OrderedDict()
 
 
 class AdjGrid(NGrid):
     
-    def __init__(self, size, adjacency, array=None):
+    def __init__(self, size, adjacency, array=None, storage='list', dtype=None, boundary='clip', path=None):
+        """ The boundary is either 'clip', where the edges of the board are
+            hard, 'wrap', where they join up with the opposite edges,
+            or a sequence of these giving the behaviour in each dimension.
+            """
         
-        super().__init__(size, array)
+        super().__init__(size, array, storage, dtype, path)
         
         self.adjacency = adjacency
         
-        # Initialise offsets
+        if isinstance(boundary, str):
+            boundary = (boundary,) * len(self.size)
+        self.boundary = tuple(boundary)
+        for mode in self.boundary:
+            if mode not in ('clip', 'wrap'):
+                raise ValueError(f"Unknown boundary mode '{mode}'.")
+        if len(self.boundary) != len(self.size):
+            raise ValueError(f'Boundary must be length {len(self.size)} not {len(self.boundary)}.')
+        self.wrap = tuple(mode == 'wrap' for mode in self.boundary)
+        
+        # Initialise offsets, and the change in array index each one makes
+        # away from the edges of the board
         self.offsets = self.get_offsets()
+        self.deltas = tuple(sum(map(mul, offset, self.strides)) for offset in self.offsets)
+        
+        # The neighbour table is built the first time it is needed
+        self.neighbour_table = None
     
     def get_offsets(self):
         """ Offsets are coordinates holding -1, 0, or 1 in each place.
@@ -41,26 +70,140 @@ class AdjGrid(NGrid):
         return good_offsets
     
     
+    def is_interior(self, coord):
+        """ Check if a coordinate is away from every edge of the board,
+            so that all its neighbours are on the board and found by adding
+            the offsets (or the deltas to its array index) without wrapping.
+            """
+        
+        for c, dim in zip(coord, self.size):
+            if not 0 < c < dim - 1:
+                return False
+        return True
+    
+    
     def get_neighbours(self, coord):
         """ Get all neighbours of a given coordinate.
             Neighbours are the squares that count for minesweeper adjacency.
+            In wrapped dimensions, a neighbour may be found more than once
+            if the board is less than 3 squares across.
             """
+        
+        if self.is_interior(coord):
+            return [list(map(add, coord, offset)) for offset in self.offsets]
             
         neighbours = []
         
         # Iterate over all good offsets
         for offset in self.offsets:
             
-            # Add the offset to the current coordinate,
-            # and keep any candidate that is actually on the board
+            # Add the offset to the current coordinate, wrap it around
+            # where needed, and keep any candidate that is actually on the board
             candidate = list(coord)
             good_candidate = True
             for i in range(len(self.size)):
                 candidate[i] += offset[i]
                 if not 0 <= candidate[i] < self.size[i]:
-                    good_candidate = False
-                    break
+                    if self.wrap[i]:
+                        candidate[i] %= self.size[i]
+                    else:
+                        good_candidate = False
+                        break
             if good_candidate:
                 neighbours.append(candidate)
                 
-        return neighbours
\ No newline at end of file
+        return neighbours
+    
+    
+    def get_neighbour_table(self):
+        """ Get the neighbour table for this board's size, adjacency and boundary.
+            The table is a pair (starts, indices) in compressed sparse row form:
+            the neighbours of the cell at array index i are the array indices
+            indices[starts[i]:starts[i+1]], in the same order as get_neighbours.
+            """
+        
+        if self.neighbour_table is None:
+            key = (self.size, self.adjacency, self.boundary)
+            
+            if key in _neighbour_tables:
+                _neighbour_tables.move_to_end(key)
+            else:
+                _neighbour_tables[key] = self.build_neighbour_table()
+                while len(_neighbour_tables) > TABLE_CACHE_SIZE:
+                    _neighbour_tables.popitem(last=False)
+                    
+            self.neighbour_table = _neighbour_tables[key]
+            
+        return self.neighbour_table
+    
+    
+    def get_neighbour_indices(self, index):
+        """ Get the array indices of all neighbours of a given array index. """
+        
+        starts, indices = self.get_neighbour_table()
+        return indices[starts[index]:starts[index+1]]
+    
+    
+    def build_neighbour_table(self):
+        """ Build the (starts, indices) neighbour table from scratch.
+            Both parts are compact arrays of machine integers, which can be
+            viewed without copying as ndarrays using np.frombuffer.
+            """
+        
+        length = len(self)
+        typecode = 'i' if length < 2**31 else 'q'
+        
+        if np is None:
+            # Only cells at the edges need their neighbours checked
+            starts = array('q', [0])
+            indices = array(typecode)
+            for i, coord in self.coords():
+                if self.is_interior(coord):
+                    indices.extend([i + delta for delta in self.deltas])
+                else:
+                    indices.extend(map(self.to_linear, self.get_neighbours(coord)))
+                starts.append(len(indices))
+            return starts, indices
+        
+        dtype = np.int32 if typecode == 'i' else np.int64
+        counts = np.empty(length, dtype=np.int64)
+        parts = []
+        
+        # Work through the board in chunks to bound the size of temporary arrays,
+        # filling in one column of neighbours per offset, or -1 if off the board
+        chunk = max(1, 2**22 // (len(self.offsets) + 1))
+        for start in range(0, length, chunk):
+            cells = np.arange(start, min(start + chunk, length), dtype=dtype)
+            coords = [(cells // stride) % dim for stride, dim in zip(self.strides, self.size)]
+            edges = {}
+            for d, dim in enumerate(self.size):
+                edges[d, -1] = coords[d] == 0
+                edges[d, 1] = coords[d] == dim - 1
+            
+            table = np.empty((len(cells), len(self.offsets)), dtype=dtype)
+            for j, offset in enumerate(self.offsets):
+                column = cells + sum(map(mul, offset, self.strides))
+                off_board = np.zeros(len(cells), dtype=bool)
+                for d, o in enumerate(offset):
+                    if o == 0:
+                        continue
+                    if self.wrap[d]:
+                        column[edges[d, o]] -= o * self.size[d] * self.strides[d]
+                    else:
+                        off_board |= edges[d, o]
+                column[off_board] = -1
+                table[:, j] = column
+            
+            good = table >= 0
+            counts[start:start+len(cells)] = good.sum(axis=1)
+            parts.append(table[good])
+        
+        starts = array('q', [0])
+        starts.frombytes(np.cumsum(counts, dtype=np.int64).tobytes())
+        indices = array(typecode)
+        for part in parts:
+            indices.frombytes(part.tobytes())
+        return starts, indices
+
+
+instrument.install('adjgrid', globals())
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the hot paths of the boards and games.
+
+Each benchmark is run on every combination of dimension count, board side
+length, adjacency and storage mode asked for (ignoring the settings it does
+not depend on), with random boards drawn from a fixed seed, so repeated runs
+time exactly the same work. Results can be written to a JSON file, and
+compared against an earlier results file used as the baseline: the exit
+status is 1 if anything got slower by more than its threshold.
+
+    python bench.py --dims 2 3 4 --side 8 16 --json base.json
+    (make changes)
+    python bench.py --dims 2 3 4 --side 8 16 --baseline base.json
+"""
+
+import argparse
+import itertools as it
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import life
+import msnd
+import slide
+from adjgrid import AdjGrid
+from ngrid import NGrid, np
+
+
+# Benchmarks: (size, adjacency, storage, rng) -> (setup, run, cells)
+# setup (which may be None) is called untimed before each timed call of run,
+# and cells is the number of cells each call of run handles.
+
+
+def bench_to_linear(size, adjacency, storage, rng):
+    grid = NGrid(size, 0)
+    coords = [grid.from_linear(i) for i in range(len(grid))]
+
+    def run():
+        for coord in coords:
+            grid.to_linear(coord)
+
+    return None, run, len(grid)
+
+
+def bench_from_linear(size, adjacency, storage, rng):
+    grid = NGrid(size, 0)
+
+    def run():
+        for i in range(len(grid)):
+            grid.from_linear(i)
+
+    return None, run, len(grid)
+
+
+def bench_get_offsets(size, adjacency, storage, rng):
+    grid = AdjGrid(size, adjacency, 0)
+    return None, grid.get_offsets, 3**len(size)
+
+
+def bench_get_neighbours(size, adjacency, storage, rng):
+    grid = AdjGrid(size, adjacency, 0)
+    coords = [grid.from_linear(rng.randrange(len(grid))) for i in range(min(len(grid), 1000))]
+
+    def run():
+        for coord in coords:
+            grid.get_neighbours(coord)
+
+    return None, run, len(coords)
+
+
+def bench_neighbour_table(size, adjacency, storage, rng):
+    grid = AdjGrid(size, adjacency, 0)
+    return None, grid.build_neighbour_table, len(grid)
+
+
+def life_bench(engine):
+    """ Make a benchmark of one generation of a life engine,
+        on a board a third full.
+        """
+
+    def bench(size, adjacency, storage, rng):
+        length = len(NGrid(size, 0))
+        cells = [rng.random() < 1/3 for i in range(length)]
+        board = life.Board(size, adjacency, life.conway, None, storage, engine)
+
+        def setup():
+            board.array = np.array(cells) if storage == 'numpy' else list(cells)
+            board.counts = None
+            if engine == 'incremental':
+                # Time a generation after the first, which counts every cell
+                board.update()
+
+        return setup, board.update, length
+
+    return bench
+
+
+def bench_update_neighbours(size, adjacency, storage, rng):
+    board = msnd.Board(size, adjacency, 0.2, seed=rng.getrandbits(64))
+    return None, board.update_neighbours, len(board)
+
+
+def bench_sweep(size, adjacency, storage, rng):
+    board = msnd.Board(size, adjacency, 0.1, seed=rng.getrandbits(64))
+    starts = [i for i in range(len(board)) if not board.is_mine[i] and board.mines[i] == 0]
+    start = rng.choice(starts) if starts else 0
+
+    def setup():
+        board.visibility = bytearray(len(board))
+        board.revealed = 0
+        board.set_visibility(start, 1)
+
+    return setup, lambda: board.sweep([start]), len(board)
+
+
+def slide_board(size, storage, rng):
+    """ Make a slide board with about half of its cells filled. """
+
+    board = slide.Board(size, slide.number_gens['Normal'], storage, rng.getrandbits(64))
+    for i in range(len(board)):
+        if rng.random() < 0.5:
+            board[i] = rng.choice((2, 2, 4, 8))
+    return board
+
+
+def bench_move(size, adjacency, storage, rng):
+    base = slide_board(size, storage, rng)
+    boards = []
+
+    def setup():
+        boards[:] = [base.copy()]
+
+    def run():
+        # One move each way along every dimension
+        board = boards[0]
+        for dimension in range(len(size)):
+            for increase in (False, True):
+                board.move(dimension, increase)
+
+    return setup, run, 2 * len(size) * len(base)
+
+
+def bench_add_numbers(size, adjacency, storage, rng):
+    base = slide_board(size, storage, rng)
+    boards = []
+
+    # Time at most 100 calls, stopping before the board fills up so that no
+    # call returns early. Each copy of the board draws the same numbers, so
+    # a trial run on one of them finds how many calls and cells that is.
+    trial = base.copy()
+    calls = cells = 0
+    while calls < 100 and trial.free:
+        cells += trial.add_numbers()
+        calls += 1
+
+    def setup():
+        boards[:] = [base.copy()]
+
+    def run():
+        board = boards[0]
+        for i in range(calls):
+            board.add_numbers()
+
+    return setup, run, cells
+
+
+# {name: (benchmark, settings it depends on)}
+benchmarks = {
+        'ngrid.to_linear': (bench_to_linear, ('size',)),
+        'ngrid.from_linear': (bench_from_linear, ('size',)),
+        'adjgrid.get_offsets': (bench_get_offsets, ('dims', 'adjacency')),
+        'adjgrid.get_neighbours': (bench_get_neighbours, ('size', 'adjacency')),
+        'adjgrid.build_neighbour_table': (bench_neighbour_table, ('size', 'adjacency')),
+        'life.update.cells': (life_bench('cells'), ('size', 'adjacency', 'storage')),
+        'life.update.vectorized': (life_bench('vectorized'), ('size', 'adjacency', 'storage')),
+        'life.update.slabs': (life_bench('slabs'), ('size', 'adjacency', 'storage')),
+        'life.update.bitboard': (life_bench('bitboard'), ('size', 'adjacency', 'storage')),
+        'life.update.incremental': (life_bench('incremental'), ('size', 'adjacency', 'storage')),
+        'msnd.update_neighbours': (bench_update_neighbours, ('size', 'adjacency')),
+        'msnd.sweep': (bench_sweep, ('size', 'adjacency')),
+        'slide.move': (bench_move, ('size', 'storage')),
+        'slide.add_numbers': (bench_add_numbers, ('size', 'storage'))
+    }
+
+# Benchmarks that need numpy
+needs_numpy = {'life.update.vectorized', 'life.update.slabs'}
+
+
+def measure(setup, run, min_time=0.2, min_repeats=3, max_repeats=1000):
+    """ Time calls of run until min_time has been spent in them, within the
+        given bounds on the number of calls. Returns the time of each call.
+        """
+
+    times = []
+    total = 0
+    while len(times) < max_repeats and (len(times) < min_repeats or total < min_time):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        total += times[-1]
+    return times
+
+
+def case_name(name, uses, size, adjacency, storage):
+    """ Name a benchmark case by the settings it depends on. """
+
+    parts = []
+    if 'size' in uses:
+        parts.append('x'.join(map(str, size)))
+    elif 'dims' in uses:
+        parts.append(f'{len(size)}d')
+    if 'adjacency' in uses:
+        parts.append(f'adj={adjacency}')
+    if 'storage' in uses:
+        parts.append(storage)
+    return f'{name}[{",".join(parts)}]'
+
+
+def run(names=None, dims=(2, 3), sides=(8,), adjacencies=(None,), storages=None, seed=0,
+        min_time=0.2, max_cells=None, log=None):
+    """ Run benchmarks over every combination of the settings, returning
+        {case name: result}. An adjacency of None means full adjacency.
+        Cases on boards of more than max_cells cells are skipped.
+        """
+
+    if storages is None:
+        storages = ('list',) if np is None else ('list', 'numpy')
+    names = list(benchmarks) if names is None else names
+
+    results = {}
+    for name in names:
+        bench, uses = benchmarks[name]
+        for n, side, adjacency, storage in it.product(dims, sides, adjacencies, storages):
+            size = (side,) * n
+            adjacency = n if adjacency is None else min(adjacency, n)
+            case = case_name(name, uses, size, adjacency, storage)
+            if case in results:
+                continue
+            if max_cells is not None and side**n > max_cells and 'size' in uses:
+                continue
+            if name in needs_numpy and np is None:
+                continue
+
+            # Seed each case by its name, so cases do not depend on each other
+            rng = random.Random(f'{seed}:{case}')
+            setup, call, cells = bench(size, adjacency, storage, rng)
+            times = measure(setup, call, min_time)
+
+            best = min(times)
+            results[case] = {
+                    'benchmark': name,
+                    'size': list(size),
+                    'adjacency': adjacency,
+                    'storage': storage if 'storage' in uses else None,
+                    'repeats': len(times),
+                    'best': best,
+                    'median': statistics.median(times),
+                    'cells': cells,
+                    'cells_per_sec': cells / best if best else None
+                }
+            if log is not None:
+                log.write(f'{case: <60} {best * 1e3:10.3f} ms\n')
+                log.flush()
+
+    return results
+
+
+def compare(results, baseline, threshold=0.1, thresholds=None):
+    """ Compare best times against a baseline, returning a list of
+        (case, baseline time, time, ratio) for every case that slowed down by
+        more than its threshold, as a fraction. Thresholds can be set for
+        particular benchmarks or cases by name, where the longest matching
+        prefix of a case name is used.
+        """
+
+    thresholds = thresholds or {}
+    regressions = []
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        before = baseline[case]['best']
+        ratio = result['best'] / before if before else float('inf')
+
+        limit = threshold
+        prefixes = [prefix for prefix in thresholds if case.startswith(prefix)]
+        if prefixes:
+            limit = thresholds[max(prefixes, key=len)]
+
+        if ratio > 1 + limit:
+            regressions.append((case, before, result['best'], ratio))
+    return regressions
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of the boards and games.')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(benchmarks), help='the benchmarks to run (all by default)')
+    parser.add_argument('--dims', type=int, nargs='+', default=[2, 3], help='numbers of dimensions')
+    parser.add_argument('--side', type=int, nargs='+', default=[8], help='side lengths of the boards')
+    parser.add_argument('--adjacency', type=int, nargs='+', default=None,
+                        help='adjacencies (full adjacency by default)')
+    parser.add_argument('--storage', nargs='+', choices=['list', 'numpy'], default=None,
+                        help='storage modes (all available by default)')
+    parser.add_argument('--max-cells', type=int, default=None, help='skip boards with more cells than this')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds to spend timing each case')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare against the results in this file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='the fraction by which a case may slow down before it counts as a regression')
+    parser.add_argument('--threshold-for', nargs='+', default=[], metavar='NAME=FRACTION',
+                        help='thresholds for benchmarks or cases whose names start with NAME')
+    args = parser.parse_args(argv)
+
+    thresholds = {}
+    for item in args.threshold_for:
+        name, _, value = item.rpartition('=')
+        thresholds[name] = float(value)
+
+    results = run(args.benchmarks, args.dims, args.side, args.adjacency or [None], args.storage, args.seed,
+                  args.min_time, args.max_cells, sys.stdout)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({
+                    'python': platform.python_version(),
+                    'numpy': None if np is None else np.__version__,
+                    'machine': platform.machine(),
+                    'seed': args.seed,
+                    'results': results
+                }, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+
+        regressions = compare(results, baseline, args.threshold, thresholds)
+        for case, before, after, ratio in regressions:
+            print(f'Regression: {case} took {after * 1e3:.3f} ms, was {before * 1e3:.3f} ms ({ratio:.2f}x)')
+        if regressions:
+            return 1
+        print(f'No regressions against {len(set(results) & set(baseline))} baseline cases.')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
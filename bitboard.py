@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+from array import array
+
+from ngrid import np
+
+
+# Translations between cell bytes (0 or 1) and binary digits
+_to_digits = bytes.maketrans(b'\x00\x01', b'01')
+_from_digits = bytes.maketrans(b'01', b'\x00\x01')
+
+
+class Bitboard:
+    """ Packs boolean layers of a board into Python ints, with bit i holding
+        the cell at array index i, so that each operation on a layer works on
+        every cell at once, a machine word of cells at a time.
+        Shifting a layer one step along a dimension is a shift by that
+        dimension's stride, masked at the edges and, for wrapped dimensions,
+        with the cells falling off one edge rotated back in at the other.
+        Neighbours are counted with bit-sliced adders: a count is held as a
+        list of layers, one per binary digit, and each shifted layer is added
+        in with a chain of half adders.
+        """
+
+    def __init__(self, size, wrap):
+        self.size = tuple(size)
+        self.wrap = tuple(wrap)
+
+        self.strides = []
+        length = 1
+        for dim in self.size:
+            self.strides.append(length)
+            length *= dim
+        self.length = length
+        self.full = (1 << length) - 1
+
+        # The cells at the low and high edge of each dimension
+        self.low = []
+        self.high = []
+        for dim, stride in zip(self.size, self.strides):
+            low = _repeat((1 << stride) - 1, stride * dim, length // (stride * dim)) if length else 0
+            self.low.append(low)
+            self.high.append(low << (dim - 1) * stride)
+
+
+    def pack(self, values):
+        """ Pack a sequence of cell values into a layer, by truth. """
+
+        if np is not None and isinstance(values, np.ndarray):
+            return int.from_bytes(np.packbits(values.astype(bool), bitorder='little').tobytes(), 'little')
+
+        if not isinstance(values, (bytes, bytearray)):
+            values = bytes(map(bool, values))
+        return int(values.translate(_to_digits)[::-1], 2) if values else 0
+
+
+    def unpack(self, layer):
+        """ Unpack a layer into bytes holding 0 or 1 for each cell. """
+
+        return self.digits(layer).encode('ascii').translate(_from_digits)
+
+
+    def digits(self, layer):
+        """ Get a layer as a string of '0' and '1' for each cell. """
+
+        return format(layer, f'0{self.length}b')[::-1] if self.length else ''
+
+
+    def shift(self, layer, dim, offset):
+        """ Get the layer holding, at each cell, the value of the cell
+            offset (1 or -1) steps away along a dimension, or 0 beyond a
+            clipped edge.
+            """
+
+        stride = self.strides[dim]
+        across = (self.size[dim] - 1) * stride
+        if offset > 0:
+            result = (layer >> stride) & ~self.high[dim]
+            if self.wrap[dim]:
+                result |= (layer << across) & self.high[dim]
+        else:
+            result = (layer << stride) & ~self.low[dim] & self.full
+            if self.wrap[dim]:
+                result |= (layer >> across) & self.low[dim]
+        return result
+
+
+    def neighbour_counts(self, layer, adjacency):
+        """ Count the live neighbours of every cell, for neighbours that
+            differ in up to adjacency dimensions. Returns the count as a list
+            of layers, least significant digit first.
+            """
+
+        # Shift the layer along one dimension at a time, keeping the number
+        # of dimensions shifted along so far for each copy
+        copies = [(layer, 0)]
+        for dim in range(len(self.size)):
+            shifted = []
+            for copy, changes in copies:
+                if changes < adjacency:
+                    shifted.append((self.shift(copy, dim, -1), changes + 1))
+                    shifted.append((self.shift(copy, dim, 1), changes + 1))
+            copies.extend(shifted)
+
+        planes = []
+        for copy, changes in copies[1:]:
+            carry = copy
+            for digit, plane in enumerate(planes):
+                if not carry:
+                    break
+                planes[digit], carry = plane ^ carry, plane & carry
+            if carry:
+                planes.append(carry)
+        return planes
+
+
+    def equals(self, planes, count):
+        """ Get the layer of cells whose bit-sliced count equals a number. """
+
+        if count >> len(planes):
+            return 0
+        result = self.full
+        for digit, plane in enumerate(planes):
+            result &= plane if count >> digit & 1 else self.full ^ plane
+        return result
+
+
+    def apply_rule(self, layer, planes, rule_table):
+        """ Get the next generation of a layer of life cells from their
+            neighbour counts, with a rule table as from life.Board.get_rule_table.
+            """
+
+        born = 0
+        survive = 0
+        for count in range(len(rule_table[0])):
+            if rule_table[0][count] or rule_table[1][count]:
+                match = self.equals(planes, count)
+                if rule_table[0][count]:
+                    born |= match
+                if rule_table[1][count]:
+                    survive |= match
+        return (born & ~layer | survive & layer) & self.full
+
+
+    def counts(self, planes, typecode='B'):
+        """ Get bit-sliced counts as an array of machine integers. """
+
+        width = array(typecode).itemsize
+        lanes = {48: '\x00' * width, 49: '\x01' + '\x00' * (width - 1)}
+
+        # Spread each digit out to one lane per cell and add them up
+        total = 0
+        for digit, plane in enumerate(planes):
+            total += int.from_bytes(self.digits(plane).translate(lanes).encode('latin-1'), 'little') << digit
+
+        result = array(typecode)
+        result.frombytes(total.to_bytes(self.length * width, 'little'))
+        if sys.byteorder == 'big':
+            result.byteswap()
+        return result
+
+
+def _repeat(pattern, period, times):
+    """ Repeat a bit pattern a number of times, every period bits. """
+
+    result = 0
+    block = pattern
+    while times:
+        if times & 1:
+            result = (result << period) | block
+        block |= block << period
+        period *= 2
+        times >>= 1
+    return result
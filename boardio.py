@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A compact binary format for saving and loading boards.
+
+The file starts with a header:
+    magic       4 bytes, b'NDGB'
+    version     u8
+    flags       u8, bit 0 set if the payload is zlib compressed
+    game        u8 length, then ASCII: 'grid', 'life', 'msnd' or 'slide'
+    ndim        u8, then the size in each dimension as u64
+    adjacency   i16, or -1 for boards without adjacency
+    wrap        u64, bit d set if dimension d wraps around
+    metadata    u32 length, then JSON with any game-specific settings
+    layers      u8 count, then for each layer its name and type,
+                each as u8 length then ASCII
+and is followed by the payload: each layer in turn, holding one value per
+cell in array order. Layers of type 'bit' are bit-packed (least significant
+bit first), and the others are fixed-width little-endian integers
+('u8', 'u16', 'u32', 'u64' or 'i64') or floats ('f32' or 'f64').
+Everything is little-endian. Boards are read and written in chunks, so
+no intermediate list of the whole board is ever built.
+"""
+
+import json
+import numbers
+import struct
+import sys
+import zlib
+from array import array
+
+from ngrid import NGrid, np
+
+
+MAGIC = b'NDGB'
+VERSION = 1
+
+# Cells handled at a time when streaming, a multiple of 8 to keep bytes whole
+CHUNK = 2**20
+
+_int_types = {
+        'u8': ('B', 1),
+        'u16': ('H', 2),
+        'u32': ('I', 4),
+        'u64': ('Q', 8),
+        'i64': ('q', 8)
+    }
+
+_float_types = {
+        'f32': ('f', 4),
+        'f64': ('d', 8)
+    }
+
+_value_types = dict(_int_types, **_float_types)
+
+
+def save(board, file, compress=False):
+    """ Save a board to a path or a binary file object. """
+
+    if isinstance(file, str):
+        with open(file, 'wb') as f:
+            return save(board, f, compress)
+
+    game, metadata, layers = _describe(board)
+
+    header = bytearray(MAGIC)
+    header += struct.pack('<BB', VERSION, 1 if compress else 0)
+    _pack_str(header, game)
+    header += struct.pack('<B', len(board.size))
+    header += struct.pack(f'<{len(board.size)}Q', *board.size)
+    header += struct.pack('<h', getattr(board, 'adjacency', -1))
+    header += struct.pack('<Q', sum(1 << d for d, wrap in enumerate(getattr(board, 'wrap', ())) if wrap))
+    meta = json.dumps(metadata).encode()
+    header += struct.pack('<I', len(meta)) + meta
+    header += struct.pack('<B', len(layers))
+    for name, kind, values in layers:
+        _pack_str(header, name)
+        _pack_str(header, kind)
+    file.write(header)
+
+    compressor = zlib.compressobj() if compress else None
+    for name, kind, values in layers:
+        for start in range(0, len(board), CHUNK):
+            data = _encode(values[start:start + CHUNK], kind)
+            file.write(compressor.compress(data) if compressor else data)
+    if compressor:
+        file.write(compressor.flush())
+
+
+def load(file, rules=None, number_gen=None, storage=None, path=None):
+    """ Load a board from a path or a binary file object.
+        Life rules and slide number generators are found by the name they
+        were saved under (or the rulestring, for life rules), unless given
+        here. The storage mode defaults to
+        the one the board was saved with, where possible. Life and plain
+        boards can be loaded with mmap storage by giving the path of the
+        file to map them from, and are loaded with numpy storage otherwise.
+        """
+
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            return load(f, rules, number_gen, storage, path)
+
+    if file.read(4) != MAGIC:
+        raise ValueError('Not a saved board.')
+    version, flags = struct.unpack('<BB', _read(file, 2))
+    if version > VERSION:
+        raise ValueError(f'Saved board version {version} is newer than supported version {VERSION}.')
+    game = _unpack_str(file)
+    ndim, = struct.unpack('<B', _read(file, 1))
+    size = struct.unpack(f'<{ndim}Q', _read(file, 8 * ndim))
+    adjacency, wrap = struct.unpack('<hQ', _read(file, 10))
+    boundary = tuple('wrap' if wrap >> d & 1 else 'clip' for d in range(ndim))
+    meta_length, = struct.unpack('<I', _read(file, 4))
+    metadata = json.loads(_read(file, meta_length).decode())
+    layer_count, = struct.unpack('<B', _read(file, 1))
+    kinds = [(_unpack_str(file), _unpack_str(file)) for i in range(layer_count)]
+
+    if storage is None:
+        storage = metadata.get('storage', 'list')
+    if storage == 'mmap' and (path is None or game not in ('life', 'grid')):
+        storage = 'numpy'
+    if np is None:
+        storage = 'list'
+
+    length = 1
+    for dim in size:
+        length *= dim
+
+    stream = _Decompressed(file) if flags & 1 else file
+    layers = {name: _read_layer(stream, kind, length, storage, path) for name, kind in kinds}
+
+    if game == 'life':
+        import life
+        if rules is None:
+            if metadata.get('rules') is None:
+                raise ValueError('The rules were not saved, so they must be given.')
+            rules = metadata['rules']
+        return life.Board(size, adjacency, rules, layers['state'], storage,
+                          metadata.get('engine', 'cells'), boundary, path)
+
+    if game == 'msnd':
+        import msnd
+        board = msnd.Board(size, adjacency, 0, boundary)
+        board.is_mine = bytearray(layers['is_mine'])
+        board.visibility = bytearray(layers['visibility'])
+        board.safe = length - board.is_mine.count(1)
+        board.revealed = sum(1 for is_mine, visibility in zip(board.is_mine, board.visibility)
+                             if not is_mine and visibility == 1)
+        board.update_neighbours()
+        return board
+
+    if game == 'slide':
+        import slide
+        if number_gen is None:
+            number_gen = slide.number_gens[metadata.get('number_gen', 'Normal')]
+        board = slide.Board(size, number_gen, storage)
+        board.array = layers['value']
+        board.update_free()
+        return board
+
+    return NGrid(size, layers['value'], storage, path=path)
+
+
+def _describe(board):
+    """ Get the game type, metadata and (name, type, values) layers of a board. """
+
+    import life
+    import msnd
+    import slide
+
+    if isinstance(board, life.Board):
+        names = [name for name, rules in life.configs.items() if rules is board.rules]
+        if not names and isinstance(board.rules, life.Rule):
+            names = [str(board.rules)]
+        metadata = {'storage': board.storage, 'engine': board.engine, 'rules': names[0] if names else None}
+        return 'life', metadata, [('state', 'bit', board.array)]
+
+    if isinstance(board, msnd.Board):
+        return 'msnd', {}, [('is_mine', 'bit', board.is_mine), ('visibility', 'u8', board.visibility)]
+
+    if isinstance(board, slide.Board):
+        names = [name for name, gen in slide.number_gens.items() if gen is board.number_gen]
+        metadata = {'storage': board.storage, 'number_gen': names[0] if names else None}
+        return 'slide', metadata, [('value', _value_kind(board.array), board.array)]
+
+    return 'grid', {'storage': board.storage}, [('value', _value_kind(board.array), board.array)]
+
+
+def _value_kind(values):
+    """ Choose the narrowest layer type holding all the values exactly:
+        bits if they are all bools, floats if any of them are, and integers
+        otherwise. Raises a ValueError for values of any other type, such as
+        None, or for integers too large for 64 bits.
+        """
+
+    bits = True
+    floats = None
+    low = high = 0
+    for start in range(0, len(values), CHUNK):
+        chunk = values[start:start + CHUNK]
+        if not len(chunk):
+            continue
+        if np is not None and isinstance(chunk, np.ndarray):
+            types = {chunk.dtype.type}
+        else:
+            types = set(map(type, chunk))
+
+        for t in types:
+            if t is bool or (np is not None and issubclass(t, np.bool_)):
+                continue
+            bits = False
+            if issubclass(t, numbers.Integral):
+                continue
+            if not issubclass(t, numbers.Real):
+                raise ValueError(f'Cannot save cells holding {t.__name__} values.')
+            # Floats are only saved as f32 if they all started out that narrow
+            narrow = np is not None and issubclass(t, np.floating) and np.dtype(t).itemsize <= 4
+            floats = 'f32' if narrow and floats != 'f64' else 'f64'
+
+        if floats is None:
+            low = min(low, int(min(chunk)))
+            high = max(high, int(max(chunk)))
+
+    if bits:
+        return 'bit'
+    if floats is not None:
+        return floats
+
+    if low < 0:
+        if low < -2**63 or high >= 2**63:
+            raise ValueError(f'Cannot save integers from {low} to {high} in 64 bits.')
+        return 'i64'
+    for kind in ('u8', 'u16', 'u32', 'u64'):
+        if high < 2**(8 * _int_types[kind][1]):
+            return kind
+    raise ValueError(f'Cannot save integers as large as {high} in 64 bits.')
+
+
+def _encode(values, kind):
+    """ Encode a chunk of cell values as bytes. """
+
+    if kind == 'bit':
+        if np is not None:
+            return np.packbits(np.asarray(values, dtype=bool), bitorder='little').tobytes()
+        packed = bytearray((len(values) + 7) // 8)
+        for i, value in enumerate(values):
+            if value:
+                packed[i >> 3] |= 1 << (i & 7)
+        return bytes(packed)
+
+    typecode, width = _value_types[kind]
+    if np is not None:
+        return np.asarray(values).astype(f'<{typecode}').tobytes()
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _read_layer(stream, kind, length, storage, path=None):
+    """ Read a layer of cell values, as an ndarray for numpy storage, an
+        ndarray mapped from path for mmap storage, and as a list (or bytearray
+        of 0s and 1s for bits) otherwise.
+        """
+
+    if kind == 'bit':
+        if storage != 'list':
+            values = _empty(length, bool, storage, path)
+        else:
+            values = bytearray(length)
+        for start in range(0, length, CHUNK):
+            count = min(CHUNK, length - start)
+            data = _read(stream, (count + 7) // 8)
+            if np is not None:
+                bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=count, bitorder='little')
+                values[start:start + count] = bits.astype(bool) if storage != 'list' else bits.tobytes()
+            else:
+                values[start:start + count] = bytes(data[i >> 3] >> (i & 7) & 1 for i in range(count))
+        if storage == 'list':
+            values = [bool(value) for value in values]
+        return values
+
+    typecode, width = _value_types[kind]
+    if storage != 'list':
+        dtype = {'u64': np.uint64, 'f32': np.float32, 'f64': np.float64}.get(kind, np.int64)
+        values = _empty(length, dtype, storage, path)
+    else:
+        values = []
+    for start in range(0, length, CHUNK):
+        count = min(CHUNK, length - start)
+        data = _read(stream, count * width)
+        if storage != 'list':
+            values[start:start + count] = np.frombuffer(data, dtype=f'<{typecode}')
+        else:
+            chunk = array(typecode)
+            chunk.frombytes(data)
+            if sys.byteorder == 'big':
+                chunk.byteswap()
+            values.extend(chunk)
+    return values
+
+
+def _empty(length, dtype, storage, path):
+    if storage == 'mmap':
+        return np.memmap(path, dtype, 'w+', shape=(length,))
+    return np.empty(length, dtype=dtype)
+
+
+class _Decompressed:
+    """ A minimal file-like reader decompressing a zlib stream on the fly. """
+
+    def __init__(self, file):
+        self.file = file
+        self.decompressor = zlib.decompressobj()
+        self.buffer = bytearray()
+
+    def read(self, count):
+        while len(self.buffer) < count and not self.decompressor.eof:
+            data = self.file.read(2**16)
+            if not data:
+                break
+            self.buffer += self.decompressor.decompress(data)
+        result = bytes(self.buffer[:count])
+        del self.buffer[:count]
+        return result
+
+
+def _read(file, count):
+    data = file.read(count)
+    if len(data) != count:
+        raise ValueError('Saved board is truncated.')
+    return data
+
+
+def _pack_str(buffer, string):
+    data = string.encode('ascii')
+    buffer += struct.pack('<B', len(data)) + data
+
+
+def _unpack_str(file):
+    length, = struct.unpack('<B', _read(file, 1))
+    return _read(file, length).decode('ascii')
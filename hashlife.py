@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+class Node:
+    """ A node of a hyper-octree covering a cube of side 2**level.
+        Leaves (level 0) are single cells, and every other node has 2**n
+        children, where the child at index b covers the upper half of the cube
+        in dimension d exactly when bit d of b is set.
+        Nodes in the cache are canonical, so equal nodes are the same object.
+        """
+
+    __slots__ = ('level', 'children', 'population', 'results')
+
+    def __init__(self, level, children, population):
+        self.level = level
+        self.children = children
+        self.population = population
+
+        # Memoised futures, as {log2(generations): Node}
+        self.results = None
+
+
+class HashLife:
+    """ A HashLife universe for the n-dimensional Game of Life.
+        The universe is unbounded, so patterns are not clipped by the edges of
+        the board they were taken from. Advancing by 2**k generations takes
+        time depending on the number of distinct nodes involved rather than on
+        k, which makes long runs of stable or periodic patterns cheap.
+        """
+
+    def __init__(self, ndim, offsets, rule_table, max_nodes=2**20):
+        """ The rule table is indexed by state then by number of live
+            neighbours, as from life.Board.get_rule_table.
+            The node cache never holds more than max_nodes nodes: when it is
+            full it is garbage collected, even in the middle of a step,
+            keeping only the nodes still in use. A MemoryError is raised if
+            those alone fill half of it.
+            """
+
+        if rule_table[0][0]:
+            raise ValueError('HashLife cannot simulate rules where cells are born with no live neighbours.')
+
+        self.ndim = ndim
+        self.offsets = offsets
+        self.rule_table = rule_table
+        self.max_nodes = max_nodes
+
+        # The hash-cons table, mapping a tuple of children to their parent
+        self.nodes = {}
+        self.leaves = (Node(0, (), 0), Node(0, (), 1))
+        self.empties = [self.leaves[0]]
+
+        # The nodes whose results are being worked out, which collect keeps
+        self.working = []
+
+        self.precompute()
+
+        # The root covers the cube from origin to origin + 2**root.level
+        self.root = self.empty(1)
+        self.origin = (0,) * ndim
+        self.generation = 0
+
+
+    def precompute(self):
+        """ Precompute the index arithmetic used to split nodes apart.
+            A node of level k is viewed as a 4**n grid of its grandchildren,
+            flattened with 4**d as the multiplier of dimension d.
+            """
+
+        n = self.ndim
+
+        def bits(b):
+            return tuple((b >> d) & 1 for d in range(n))
+
+        def flat(coord, base):
+            return sum(c * base**d for d, c in enumerate(coord))
+
+        # The (child, grandchild) holding each position of the 4**n grid
+        self.grid = []
+        for p in range(4**n):
+            coord = tuple((p // 4**d) % 4 for d in range(n))
+            self.grid.append((flat([c >> 1 for c in coord], 2), flat([c & 1 for c in coord], 2)))
+
+        # The grid positions of the children of the 3**n overlapping
+        # intermediate nodes, flattened with 3**d as the multiplier
+        self.intermediates = []
+        for r in range(3**n):
+            q = tuple((r // 3**d) % 3 for d in range(n))
+            self.intermediates.append(tuple(
+                    flat([c + i for c, i in zip(q, bits(b))], 4) for b in range(2**n)))
+
+        # The intermediate results making up each child of the final result
+        self.finals = []
+        for b in range(2**n):
+            self.finals.append(tuple(
+                    flat([c + i for c, i in zip(bits(b), bits(b2))], 3) for b2 in range(2**n)))
+
+        # For the base case, the grid positions of each central cell
+        # and of its neighbours
+        self.centre_cells = []
+        for b in range(2**n):
+            coord = [1 + i for i in bits(b)]
+            self.centre_cells.append((
+                    flat(coord, 4),
+                    tuple(flat([c + o for c, o in zip(coord, offset)], 4) for offset in self.offsets)))
+
+
+    def join(self, children):
+        """ Get the canonical node with the given children. """
+
+        children = tuple(children)
+        node = self.nodes.get(children)
+        if node is None:
+            if len(self.nodes) >= self.max_nodes:
+                self.collect()
+            node = Node(children[0].level + 1, children, sum(child.population for child in children))
+            self.nodes[children] = node
+        return node
+
+
+    def empty(self, level):
+        """ Get the canonical empty node of a given level. """
+
+        while len(self.empties) <= level:
+            self.empties.append(self.join((self.empties[-1],) * 2**self.ndim))
+        return self.empties[level]
+
+
+    def centre(self, node):
+        """ Get the node of one level lower at the centre of a node. """
+
+        mask = 2**self.ndim - 1
+        return self.join(child.children[~b & mask] for b, child in enumerate(node.children))
+
+
+    def pad(self, node):
+        """ Get the node of one level higher with this node at its centre. """
+
+        mask = 2**self.ndim - 1
+        empty = self.empty(node.level - 1)
+        children = []
+        for b, child in enumerate(node.children):
+            grandchildren = [empty] * 2**self.ndim
+            grandchildren[~b & mask] = child
+            children.append(self.join(grandchildren))
+        return self.join(children)
+
+
+    def result(self, node, j):
+        """ Get the centre of a node of level k >= 2 after 2**j generations,
+            where j <= k - 2.
+            """
+
+        if node.population == 0:
+            return self.empty(node.level - 1)
+
+        if node.results is None:
+            node.results = {}
+        elif j in node.results:
+            return node.results[j]
+
+        if node.level == 2:
+            result = self.base_result(node)
+        else:
+            self.working.append(node)
+            grid = [node.children[c].children[g] for c, g in self.grid]
+
+            # Advance the overlapping intermediate nodes by up to half the time
+            intermediates = []
+            for positions in self.intermediates:
+                intermediate = self.join(grid[p] for p in positions)
+                if j == node.level - 2:
+                    intermediates.append(self.result(intermediate, j - 1))
+                else:
+                    intermediates.append(self.centre(intermediate))
+
+            # Then advance the nodes they make up by the rest of the time
+            k = min(j, node.level - 3)
+            result = self.join(
+                    self.result(self.join(intermediates[r] for r in positions), k)
+                    for positions in self.finals)
+            self.working.pop()
+
+            # The cache may have been collected in the meantime
+            if node.results is None:
+                node.results = {}
+
+        node.results[j] = result
+        return result
+
+
+    def base_result(self, node):
+        """ Get the centre of a node of level 2 after one generation. """
+
+        grid = [node.children[c].children[g].population for c, g in self.grid]
+
+        children = []
+        for p, neighbours in self.centre_cells:
+            adj = 0
+            for neighbour in neighbours:
+                adj += grid[neighbour]
+            children.append(self.leaves[self.rule_table[grid[p]][adj]])
+        return self.join(children)
+
+
+    def is_centred(self, node):
+        """ Check if all live cells of a node are in its central half. """
+
+        return node.population == self.centre(node).population
+
+
+    def step(self, j):
+        """ Advance the universe by 2**j generations at once. """
+
+        self.working = []
+
+        # Pad the root until it is big enough that nothing can escape
+        # the part of it kept by result
+        while self.root.level < j + 2 or not self.is_centred(self.root):
+            self.expand()
+        self.expand()
+
+        half = 2**(self.root.level - 2)
+        self.root = self.result(self.root, j)
+        self.origin = tuple(o + half for o in self.origin)
+        self.generation += 2**j
+
+
+    def advance(self, generations):
+        """ Advance the universe by any number of generations,
+            as a sequence of steps by powers of two.
+            """
+
+        j = 0
+        while generations:
+            if generations & 1:
+                self.step(j)
+            generations >>= 1
+            j += 1
+
+
+    def expand(self):
+        """ Pad the root, keeping the position of the pattern. """
+
+        half = 2**(self.root.level - 1)
+        self.root = self.pad(self.root)
+        self.origin = tuple(o - half for o in self.origin)
+
+
+    def collect(self):
+        """ Garbage collect the node cache, keeping only the nodes that make up
+            the root or the nodes being worked on, and forgetting all memoised
+            results. Nodes held only by a step in progress stay valid, but are
+            no longer canonical.
+            """
+
+        nodes = {}
+        stack = [self.root] + self.empties[1:] + self.working
+        while stack:
+            node = stack.pop()
+            node.results = None
+            if node.level > 0 and node.children not in nodes:
+                nodes[node.children] = node
+                stack.extend(node.children)
+        self.nodes = nodes
+
+        if len(nodes) > self.max_nodes // 2:
+            raise MemoryError(f'HashLife needs more than {self.max_nodes // 2} nodes for the pattern in use.')
+
+
+    def set_cells(self, cells):
+        """ Replace the universe with one whose live cells are the given
+            coordinates, without changing the generation count.
+            """
+
+        cells = list(cells)
+        if not cells:
+            self.root = self.empty(1)
+            return
+
+        self.origin = tuple(map(min, zip(*cells)))
+        extent = max(max(c) - o for c, o in zip(zip(*cells), self.origin)) + 1
+        level = max(1, (extent - 1).bit_length())
+        self.root = self.build(level, [tuple(c - o for c, o in zip(cell, self.origin)) for cell in cells])
+
+
+    def build(self, level, cells):
+        """ Build a node from the coordinates of its live cells. """
+
+        if not cells:
+            return self.empty(level)
+        if level == 0:
+            return self.leaves[1]
+
+        half = 2**(level - 1)
+        parts = [[] for b in range(2**self.ndim)]
+        for cell in cells:
+            b = 0
+            for d, c in enumerate(cell):
+                if c >= half:
+                    b |= 1 << d
+            parts[b].append(tuple(c % half for c in cell))
+
+        return self.join(self.build(level - 1, part) for part in parts)
+
+
+    def get_cells(self):
+        """ Yield the coordinates of every live cell. """
+
+        stack = [(self.root, self.origin)]
+        while stack:
+            node, corner = stack.pop()
+            if node.population == 0:
+                continue
+            if node.level == 0:
+                yield corner
+                continue
+            half = 2**(node.level - 1)
+            for b, child in enumerate(node.children):
+                stack.append((child, tuple(c + half * ((b >> d) & 1) for d, c in enumerate(corner))))
+
+
+    @classmethod
+    def from_board(cls, board, max_nodes=2**20):
+        """ Create a universe holding the live cells of a life.Board. """
+
+        if any(board.wrap):
+            raise ValueError('HashLife cannot simulate boards with wrapped edges.')
+
+        universe = cls(len(board.size), board.offsets, board.get_rule_table(), max_nodes)
+        universe.set_cells(coord for i, coord in board.coords() if board.array[i])
+        return universe
+
+
+    def bounds(self):
+        """ Get the lowest and highest coordinates of the live cells in each
+            dimension, as a pair of tuples, or None if there are none.
+            """
+
+        low = high = None
+        for cell in self.get_cells():
+            if low is None:
+                low = high = cell
+            else:
+                low = tuple(map(min, low, cell))
+                high = tuple(map(max, high, cell))
+        return None if low is None else (low, high)
+
+
+    def room(self, board):
+        """ Get the number of cells the live cells could move in any direction
+            and all stay on a life.Board, or -1 if some are off it already.
+            A universe whose cells have never left a board behaves exactly as
+            the board does, as the cells beyond the board's clipped edges are
+            then dead in both.
+            """
+
+        bounds = self.bounds()
+        if bounds is None:
+            return float('inf')
+        return min(min(l, dim - 1 - h) for l, h, dim in zip(*bounds, board.size))
+
+
+    def to_board(self, board):
+        """ Write the universe onto a life.Board. Raises a ValueError, leaving
+            the board unchanged, if any live cell is off the board.
+            """
+
+        if self.room(board) < 0:
+            raise ValueError('The pattern has spread off the board.')
+
+        if board.storage == 'mmap':
+            board.array[:] = False
+        elif board.storage == 'numpy':
+            board.array = board.array.copy()
+            board.array[:] = False
+        else:
+            board.array = [False] * len(board)
+        board.counts = None
+        board.reset_hash()
+
+        for cell in self.get_cells():
+            board.array[board.to_linear(cell)] = True
+
+
+def advance(board, generations, max_nodes=2**20):
+    """ Advance a life.Board by a number of generations using HashLife,
+        giving exactly what the board's own engines would.
+        This holds as long as no cell is ever born beyond the board's clipped
+        edges. Live cells spread by at most one cell a generation, so each
+        step is the longest (by a power of two) that cannot carry any of them
+        off the board, down to single generations near the edges. A
+        ValueError is raised, leaving the board unchanged, if a single
+        generation does spread off it.
+        """
+
+    universe = HashLife.from_board(board, max_nodes)
+
+    remaining = generations
+    while remaining:
+        room = universe.room(board)
+        j = remaining.bit_length() - 1
+        if room < 2**j:
+            j = max(0, int(room).bit_length() - 1)
+
+        universe.step(j)
+        remaining -= 2**j
+        if room < 1 and universe.room(board) < 0:
+            raise ValueError(f'The pattern spread off the board at generation {universe.generation}.')
+
+    universe.to_board(board)
+    board.generation += generations
+    return universe
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Timers and counters around the hot paths of the boards and games.
+
+Instrumentation is off by default and then costs nothing: the methods below
+are left exactly as they are. Turning it on, either by calling enable() or
+by setting the NDGAMES_INSTRUMENT environment variable before the games are
+imported, swaps each method on its class for a wrapper recording the number
+of calls, the number of cells touched and the time taken. disable() puts the
+original methods back. If NDGAMES_INSTRUMENT_OUT is also set, the report is
+written to that file as JSON when the program exits.
+
+    import instrument
+    instrument.enable()
+    ...
+    print(instrument.to_json())
+
+Other code can add its own named timers and counters with timer() and
+count(), which do nothing while instrumentation is off.
+"""
+
+import atexit
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+# The instrumented methods, by module and class:
+# {name: (module, class, method, cells, before)}
+# cells(self, args, result, before) gives the number of cells touched by a
+# call, where before is what before(self) gave just before the call, if set.
+targets = {
+        'ngrid.print_nd': ('ngrid', 'NGrid', 'print_nd', lambda self, args, result, before: len(self), None),
+        'adjgrid.get_neighbours': ('adjgrid', 'AdjGrid', 'get_neighbours',
+                                   lambda self, args, result, before: len(result), None),
+        'life.update': ('life', 'Board', 'update', lambda self, args, result, before: len(self), None),
+        'msnd.update_neighbours': ('msnd', 'Board', 'update_neighbours',
+                                   lambda self, args, result, before: len(self), None),
+        'msnd.sweep': ('msnd', 'Board', 'sweep',
+                       lambda self, args, result, before: self.revealed - before, lambda self: self.revealed),
+        'slide.move': ('slide', 'Board', 'move', lambda self, args, result, before: len(self), None),
+        'slide.add_numbers': ('slide', 'Board', 'add_numbers', lambda self, args, result, before: result, None)
+    }
+
+enabled = False
+
+# The namespaces of the modules that have been installed, by module name
+_modules = {}
+
+# The original methods that have been replaced, by target name
+_originals = {}
+
+# {name: [calls, cells, seconds]}
+stats = {}
+
+
+def install(module, namespace):
+    """ Called by each instrumented module once it is loaded, with its
+        globals, so its methods can be wrapped now or when enabled later.
+        """
+
+    _modules[module] = namespace
+    if enabled:
+        _patch(module)
+
+
+def enable():
+    """ Turn instrumentation on. """
+
+    global enabled
+    enabled = True
+    for module in list(_modules):
+        _patch(module)
+
+
+def disable():
+    """ Turn instrumentation off, restoring the original methods.
+        The statistics gathered so far are kept.
+        """
+
+    global enabled
+    enabled = False
+    for name, original in list(_originals.items()):
+        module, cls, method = targets[name][:3]
+        setattr(_modules[module][cls], method, original)
+        del _originals[name]
+
+
+def reset():
+    """ Forget the statistics gathered so far. """
+
+    stats.clear()
+
+
+def _patch(module):
+    """ Wrap the methods of a module that are not wrapped yet. """
+
+    for name, (target_module, cls, method, cells, before) in targets.items():
+        if target_module == module and name not in _originals:
+            owner = _modules[module][cls]
+            _originals[name] = owner.__dict__[method]
+            setattr(owner, method, _wrap(name, owner.__dict__[method], cells, before))
+
+
+def _wrap(name, func, cells, before):
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        snapshot = before(self) if before is not None else None
+        result = func(self, *args, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        stat = stats.setdefault(name, [0, 0, 0.0])
+        stat[0] += 1
+        stat[1] += cells(self, args, result, snapshot)
+        stat[2] += elapsed
+        return result
+
+    return wrapper
+
+
+@contextmanager
+def timer(name, cells=0):
+    """ Time a block of code as one call of a named timer. """
+
+    if not enabled:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stat = stats.setdefault(name, [0, 0, 0.0])
+        stat[0] += 1
+        stat[1] += cells
+        stat[2] += time.perf_counter() - start
+
+
+def count(name, cells=1):
+    """ Count one call of a named counter, touching a number of cells. """
+
+    if enabled:
+        stat = stats.setdefault(name, [0, 0, 0.0])
+        stat[0] += 1
+        stat[1] += cells
+
+
+def report():
+    """ Get the statistics as a dict of {name: summary}.
+        For life.update, calls per second is generations per second.
+        """
+
+    summary = {}
+    for name, (calls, cells, seconds) in sorted(stats.items()):
+        summary[name] = {
+                'calls': calls,
+                'cells': cells,
+                'seconds': seconds,
+                'seconds_per_call': seconds / calls if calls else None,
+                'calls_per_sec': calls / seconds if seconds else None,
+                'cells_per_sec': cells / seconds if seconds else None
+            }
+    return summary
+
+
+def to_json(file=None):
+    """ Get the report as JSON, also writing it to a path if given. """
+
+    text = json.dumps(report(), indent=4)
+    if file is not None:
+        with open(file, 'w') as f:
+            f.write(text)
+    return text
+
+
+if os.environ.get('NDGAMES_INSTRUMENT', '0') not in ('', '0'):
+    enabled = True
+    if os.environ.get('NDGAMES_INSTRUMENT_OUT'):
+        atexit.register(to_json, os.environ['NDGAMES_INSTRUMENT_OUT'])
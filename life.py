@@ -8,33 +8,552 @@ Created on Tue Mar 10 15:18:26 2020
 
 
 from adjgrid import AdjGrid
+from bitboard import Bitboard
+from ngrid import np
+import instrument
+from render import Renderer
+from array import array
+from collections import deque
 from time import sleep
 
 
+# The number of cells the slab engine aims to hold in memory for each slab
+SLAB_CELLS = 2**22
+
+# The number of past generations whose state hashes are kept to find cycles
+HISTORY_SIZE = 1024
+
+MASK64 = 2**64 - 1
+
+
 class Board(AdjGrid):
     
-    def __init__(self, size, adjacency, rules, array=None):
+    def __init__(self, size, adjacency, rules, array=None, storage='list', engine='cells', boundary='clip',
+                 path=None):
+        """ The rules are a life function, or a string naming one in configs
+            or giving a B/S rulestring such as 'B3/S23' (see Rule.parse).
+            With mmap storage, the board is kept in the file at path. The slab
+            engine writes each generation to a second file, path + '.next',
+            then swaps the two, so path always names the file holding the
+            current generation.
+            """
+        
+        if engine not in self.engines:
+            raise ValueError(f"Unknown engine '{engine}'.")
+        
+        if isinstance(rules, str):
+            rules = configs[rules] if rules in configs else Rule.parse(rules)
         
         self.rules = rules
-        super().__init__(size, adjacency, array)
+        self.engine = engine
+        super().__init__(size, adjacency, array, storage, bool if storage != 'list' else None, boundary, path)
+        
+        # The rules as a lookup table, built the first time it is needed
+        self.rule_table = None
+        
+        # State kept by the incremental engine: the live neighbour count of
+        # every cell, and the cells that changed in the last generation
+        self.counts = None
+        self.changed = None
+        
+        # The packing of the board used by the bitboard engine
+        self.bitboard = None
+        
+        # The buffer the slab engine writes the next generation into
+        self.spare = None
+        self.spare_path = None if path is None else path + '.next'
+        
+        # With mmap storage, run keeps the copy of a generation it checks a
+        # cycle against in this file
+        self.start_path = None if path is None else path + '.start'
+        
+        # The Zobrist hash of the live cells, kept up to date once it is first
+        # asked for, and the hashes of recent generations: in order, and as
+        # {hash: latest generation}
+        self.generation = 0
+        self.hash = None
+        self.history = deque()
+        self.seen = {}
+        self.repeat = None
    
     
+    def __setitem__(self, key, value):
+        """ Cells set by hand count as changed for the incremental engine,
+            and are kept in the state hash.
+            """
+        
+        if self.counts is None and self.hash is None:
+            super().__setitem__(key, value)
+            return
+        
+        index = self.cell_index(key)
+        if index is None:
+            # Anything other than a single cell resets the incremental engine
+            # and the hash
+            self.counts = None
+            self.reset_hash()
+            super().__setitem__(key, value)
+        elif bool(value) != bool(self.array[index]):
+            if self.counts is not None:
+                self.flip(index)
+                self.changed.append(index)
+            if self.hash is not None:
+                # The board has changed outside of the rules,
+                # so the past is no guide to cycles
+                self.hash ^= zobrist_key(index)
+                self.history.clear()
+                self.seen.clear()
+                self.record_hash()
+            self.array[index] = value
+        else:
+            self.array[index] = value
+    
+    
     def update(self):
+        """ Advance the board by one generation using the selected engine. """
+        
+        old = self.array
+        self.engines[self.engine](self)
+        self.generation += 1
+        
+        # Other engines replace the whole array, leaving the counts stale
+        if self.engine != 'incremental':
+            self.counts = None
+        
+        if self.hash is not None:
+            if self.engine == 'incremental':
+                self.hash ^= _xor_keys(self.changed)
+            elif self.array is old:
+                # Written in place, so there is nothing to compare with
+                self.hash = self.state_hash()
+            else:
+                self.hash ^= _changed_keys(old, self.array)
+            self.record_hash()
+    
+    
+    def get_hash(self):
+        """ Get the Zobrist hash of the board: the exclusive or of a random
+            64-bit key for every live cell. Once asked for, the hash is kept
+            up to date as the board changes, from the cells that flip.
+            """
+        
+        if self.hash is None:
+            self.hash = self.state_hash()
+            self.record_hash()
+        return self.hash
+    
+    
+    def state_hash(self):
+        """ Work out the hash of the board from scratch. """
+        
+        if self.storage == 'list':
+            return _xor_keys([i for i, cell in enumerate(self.array) if cell])
+        
+        result = 0
+        for start in range(0, len(self), SLAB_CELLS):
+            result ^= _xor_keys(np.flatnonzero(self.array[start:start + SLAB_CELLS]) + start)
+        return result
+    
+    
+    def reset_hash(self):
+        """ Stop keeping the hash, after the board is changed by other means. """
+        
+        self.hash = None
+        self.history.clear()
+        self.seen.clear()
+        self.repeat = None
+    
+    
+    def record_hash(self):
+        """ Add the hash of the current generation to the history, noting
+            the latest earlier generation with the same hash, if any.
+            """
+        
+        self.repeat = self.seen.get(self.hash)
+        self.history.append(self.hash)
+        self.seen[self.hash] = self.generation
+        if len(self.history) > HISTORY_SIZE:
+            oldest = self.history.popleft()
+            if self.seen.get(oldest) == self.generation - HISTORY_SIZE:
+                del self.seen[oldest]
+    
+    
+    def find_cycle(self):
+        """ Check if the hash of this generation was seen earlier in the
+            history, returning (period, transient), or None if not. The
+            transient is the generation at which the cycle was entered, as
+            far back as the history goes.
+            """
+        
+        if self.repeat is None:
+            return None
+        period = self.generation - self.repeat
+        
+        # Walk back while the generations a period apart match
+        hashes = self.history
+        first = self.generation - len(hashes) + 1
+        transient = self.repeat
+        while transient > first and hashes[transient - 1 - first] == hashes[transient - 1 - first + period]:
+            transient -= 1
+        return period, transient
+    
+    
+    def run(self, generations):
+        """ Advance the board by a number of generations, skipping ahead once
+            it settles into a cycle. A cycle found from the hashes is checked
+            by running it through once more and comparing the board with how
+            it started. Returns (period, transient) for the cycle found, or
+            (None, None) if there was none.
+            """
+        
+        target = self.generation + generations
+        self.get_hash()
+        
+        while self.generation < target:
+            self.update()
+            cycle = self.find_cycle()
+            if cycle is None:
+                continue
+            
+            period, transient = cycle
+            if self.generation + period > target:
+                # Not enough generations left to check the cycle
+                continue
+            
+            start = self.copy_cells()
+            start_hash = self.hash
+            for i in range(period):
+                self.update()
+            if self.hash != start_hash or not _same_cells(start, self.array):
+                continue
+            
+            remaining = target - self.generation
+            self.generation += remaining - remaining % period
+            
+            # The history no longer runs through consecutive generations
+            self.history.clear()
+            self.seen.clear()
+            self.record_hash()
+            
+            for i in range(remaining % period):
+                self.update()
+            return period, transient
+        
+        return None, None
+    
+    
+    def copy_cells(self):
+        """ Copy the cells of the board, to compare with later. With mmap
+            storage, the copy is another mapped file written a slab at a time,
+            so it needs no more memory than the board itself does.
+            """
+        
+        if self.storage != 'mmap':
+            return self.array.copy()
+        
+        copy = np.memmap(self.start_path, bool, 'w+', shape=(len(self),))
+        for start in range(0, len(self), SLAB_CELLS):
+            copy[start:start + SLAB_CELLS] = self.array[start:start + SLAB_CELLS]
+        return copy
+    
+    
+    def update_cells(self):
+        """ Apply the rules to each cell in turn, through the lookup table. """
         
         array2 = self.array.copy()
+        starts, indices = self.get_neighbour_table()
+        table = self.get_rule_table()
         
         for i in range(len(self)):
             
-            neighbours = self.get_neighbours(self.from_linear(i))
-            
             adj = 0
-            for neighbour in neighbours:
-                if self[neighbour]:
+            for neighbour in indices[starts[i]:starts[i+1]]:
+                if self.array[neighbour]:
                     adj += 1
             
-            array2[i] = self.rules(self.size, self.adjacency, adj, self.array[i])
+            array2[i] = table[bool(self.array[i])][adj]
+        
+        if self.storage == 'mmap':
+            self.array[:] = array2
+        else:
+            self.array = array2
+        
+        
+    def update_vectorized(self):
+        """ Apply the rules to the whole board at once using numpy.
+            Neighbour counts are found by summing shifted copies of the board,
+            and the rules are applied through a lookup table.
+            """
+        
+        state = self.to_ndarray(bool)
+        counts = self.neighbour_counts(state)
+        self.set_ndarray(np.array(self.get_rule_table())[state.view(np.uint8), counts])
+        
+        
+    def update_slabs(self):
+        """ Apply the rules to the board one slab at a time, where slabs are
+            runs of whole planes along the last dimension, and so are
+            contiguous in the array. Only the current slab and the planes
+            either side of it are held in memory, and the next generation is
+            written to a spare buffer which is then swapped with the board.
+            With mmap storage the spare buffer is a second mapped file, so
+            the board is read and written sequentially and can be larger
+            than memory.
+            """
+        
+        if self.spare is None:
+            if self.storage == 'mmap':
+                self.spare = np.memmap(self.spare_path, bool, 'w+', shape=(len(self),))
+            else:
+                self.spare = np.empty(len(self), bool)
+        
+        current = self.to_ndarray(bool)
+        result = self.spare.reshape(self.size, order='F')
+        table = np.array(self.get_rule_table())
+        _step_slabs(current, result, 0, self.size[-1], table, self.adjacency, self.wrap, self.count_dtype())
+        
+        if self.storage == 'list':
+            self.array = self.spare.tolist()
+            return
+        if self.storage == 'mmap':
+            self.spare.flush()
+            self.path, self.spare_path = self.spare_path, self.path
+        self.array, self.spare = self.spare, self.array
+        
+        
+    def update_bitboard(self):
+        """ Apply the rules to the whole board at once, with the board packed
+            into a Python int of one bit per cell (see bitboard.Bitboard).
+            This needs no numpy, and works on a machine word of cells at a time.
+            """
+        
+        if self.bitboard is None:
+            self.bitboard = Bitboard(self.size, self.wrap)
+        
+        layer = self.bitboard.pack(self.array)
+        planes = self.bitboard.neighbour_counts(layer, self.adjacency)
+        cells = self.bitboard.unpack(self.bitboard.apply_rule(layer, planes, self.get_rule_table()))
+        
+        if self.storage == 'list':
+            self.array = list(map(bool, cells))
+        else:
+            self.set_ndarray(np.frombuffer(cells, bool).copy())
+        
+        
+    def update_incremental(self):
+        """ Only re-evaluate the cells whose state or neighbour count changed
+            in the last generation, so that the time taken depends on how much
+            of the board is active rather than on its size.
+            Neighbour counts are kept up to date as cells flip.
+            """
+        
+        starts, indices = self.get_neighbour_table()
+        
+        if self.counts is None:
+            # Start by counting every cell's neighbours and checking every cell
+            self.counts = array('H', [0]) * len(self)
+            candidates = range(len(self))
+            for i in candidates:
+                if self.array[i]:
+                    self.flip(i, 1)
+        else:
+            candidates = set(self.changed)
+            for i in self.changed:
+                candidates.update(indices[starts[i]:starts[i+1]])
+        
+        table = self.get_rule_table()
         
-        self.array = array2
+        # Find every cell that flips before flipping any of them
+        flips = [i for i in candidates
+                 if table[bool(self.array[i])][self.counts[i]] != bool(self.array[i])]
+        
+        for i in flips:
+            self.flip(i)
+            self.array[i] = not self.array[i]
+        
+        self.changed = flips
+        
+        
+    def flip(self, index, delta=None):
+        """ Update the neighbour counts around a cell that is about to flip.
+            By default the change in count is worked out from the cell's
+            current state.
+            """
+            
+        if delta is None:
+            delta = -1 if self.array[index] else 1
+        
+        starts, indices = self.get_neighbour_table()
+        counts = self.counts
+        for neighbour in indices[starts[index]:starts[index+1]]:
+            counts[neighbour] += delta
+        
+        
+    def neighbour_counts(self, state, wrap=None):
+        """ Count the live neighbours of every cell of an n-dimensional
+            boolean array. Cells beyond clipped edges of the board count as
+            dead, and wrapped edges join up with the opposite edges. Which
+            dimensions wrap can be given, and defaults to the board's.
+            Neighbours that differ from a cell in exactly k dimensions are
+            counted together by taking, one dimension at a time, the sum of
+            the two copies shifted either way along it. This needs a number of
+            array additions proportional to dimensions * adjacency rather than
+            to the number of offsets.
+            """
+        
+        if wrap is None:
+            wrap = self.wrap
+        return _neighbour_counts(state, self.adjacency, wrap, self.count_dtype())
+    
+    
+    def count_dtype(self):
+        """ Get the smallest unsigned dtype that can hold a neighbour count. """
+        
+        return np.uint8 if len(self.offsets) < 256 else np.uint16
+    
+    
+    def get_rule_table(self):
+        """ Get the rules as a pair of lists of booleans,
+            indexed by current state then by number of live neighbours.
+            """
+        
+        if self.rule_table is None:
+            self.rule_table = compile_rule(self.rules, self.size, self.adjacency, len(self.offsets))
+        return self.rule_table
+    
+    
+    engines = {
+            'cells': update_cells,
+            'vectorized': update_vectorized,
+            'slabs': update_slabs,
+            'bitboard': update_bitboard,
+            'incremental': update_incremental
+        }
+
+def splitmix64(x):
+    """ The SplitMix64 mixing function, as a 64-bit hash of an integer. """
+    
+    z = (x + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def zobrist_key(index):
+    """ Get the Zobrist key of the cell at an array index. """
+    
+    return splitmix64(index)
+
+
+def _xor_keys(indices):
+    """ Get the exclusive or of the Zobrist keys of some cells. """
+    
+    if np is None or not isinstance(indices, np.ndarray):
+        result = 0
+        for index in indices:
+            result ^= splitmix64(index)
+        return result
+    
+    # The same as splitmix64, with multiplication wrapping around in uint64
+    z = indices.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return int(np.bitwise_xor.reduce(z)) if len(z) else 0
+
+
+def _changed_keys(old, new):
+    """ Get the exclusive or of the Zobrist keys of the cells that differ
+        between two arrays. ndarrays are compared a slab at a time, so that
+        boards mapped from disk are never held in memory whole.
+        """
+    
+    if np is not None and isinstance(old, np.ndarray) and isinstance(new, np.ndarray):
+        result = 0
+        for start in range(0, len(new), SLAB_CELLS):
+            stop = start + SLAB_CELLS
+            result ^= _xor_keys(np.flatnonzero(old[start:stop] != new[start:stop]) + start)
+        return result
+    return _xor_keys([i for i, (a, b) in enumerate(zip(old, new)) if bool(a) != bool(b)])
+
+
+def _same_cells(a, b):
+    """ Check if two arrays hold the same cells, comparing ndarrays a slab at
+        a time.
+        """
+    
+    if np is not None and isinstance(a, np.ndarray) and isinstance(b, np.ndarray):
+        return len(a) == len(b) and all(np.array_equal(a[start:start + SLAB_CELLS], b[start:start + SLAB_CELLS])
+                                        for start in range(0, len(a), SLAB_CELLS))
+    return all(bool(x) == bool(y) for x, y in zip(a, b))
+
+
+def _neighbour_counts(state, adjacency, wrap, dtype):
+    """ Count live neighbours as for Board.neighbour_counts. """
+    
+    adjacency = min(adjacency, state.ndim)
+    
+    # changes[k] counts the live cells that differ in exactly k of the
+    # dimensions handled so far, and match in all the others
+    changes = [state.astype(dtype)] + [np.zeros(state.shape, dtype)] * adjacency
+    
+    for axis in range(state.ndim):
+        for k in range(min(axis + 1, adjacency), 0, -1):
+            changes[k] = changes[k] + _shift_sum(changes[k-1], axis, wrap[axis])
+            
+    counts = np.zeros(state.shape, dtype)
+    for k in range(1, adjacency + 1):
+        counts += changes[k]
+    return counts
+
+
+def _step_slabs(current, result, start, stop, table, adjacency, wrap, dtype):
+    """ Write the next generation of planes start to stop (along the last
+        axis) of an n-dimensional boolean array into result, working through
+        them in slabs of about SLAB_CELLS cells. Each slab is read along with
+        the plane either side of it, which are taken from the opposite edge
+        or are all dead at the ends of the last axis, as it wraps or not.
+        """
+    
+    depth = current.shape[-1]
+    plane = current.size // depth if depth else 0
+    thickness = max(1, SLAB_CELLS // max(plane, 1))
+    
+    # The last axis is handled by the halo planes instead
+    inner_wrap = tuple(wrap[:-1]) + (False,)
+    
+    def halo(i):
+        if wrap[-1]:
+            i %= depth
+        elif not 0 <= i < depth:
+            return np.zeros(current.shape[:-1] + (1,), bool)
+        return current[..., i:i+1]
+    
+    for first in range(start, stop, thickness):
+        last = min(first + thickness, stop)
+        block = np.concatenate((halo(first - 1), current[..., first:last], halo(last)), axis=-1)
+        counts = _neighbour_counts(block, adjacency, inner_wrap, dtype)[..., 1:-1]
+        result[..., first:last] = table[block[..., 1:-1].view(np.uint8), counts]
+
+
+def _shift_sum(array, axis, wrap=False):
+    """ Sum the two copies of an array shifted by one either way along an axis,
+        either wrapping around or filling with zeros at the edges.
+        """
+    
+    if wrap:
+        return np.roll(array, 1, axis) + np.roll(array, -1, axis)
+    
+    result = np.zeros_like(array)
+    lower = (slice(None),) * axis + (slice(None, -1),)
+    upper = (slice(None),) * axis + (slice(1, None),)
+    result[upper] += array[lower]
+    result[lower] += array[upper]
+    return result
+
+
+instrument.install('life', globals())
+
 
 # Life functions: (dims, adjacency, surrounding, state) -> state
         
@@ -42,27 +561,109 @@ class Board(AdjGrid):
 # The rules for Conway's Game of Life (the common 2d version)
 def conway(dims, adj, surr, st):    
     return surr == 3 or st and surr == 2
+
+
+class Rule:
+    """ A life function given by the numbers of live neighbours at which
+        dead cells are born and live cells survive, whatever the board.
+        """
     
+    def __init__(self, born, survive):
+        self.born = frozenset(born)
+        self.survive = frozenset(survive)
+        
+        
+    def __call__(self, dims, adj, surr, st):
+        return surr in (self.survive if st else self.born)
+    
+    
+    @classmethod
+    def parse(cls, rulestring):
+        """ Parse a rulestring such as 'B3/S23', giving the counts at which
+            cells are born (B) and survive (S), in either order.
+            Counts are single digits, unless any are separated by commas or
+            given as ranges, as in 'B5,10-12/S4-6', for boards where cells
+            can have more than 9 neighbours.
+            """
+        
+        counts = {}
+        for part in rulestring.strip().upper().split('/'):
+            if not part or part[0] not in 'BS' or part[0] in counts:
+                raise ValueError(f"Invalid rulestring '{rulestring}'.")
+            body = part[1:]
+            
+            numbers = set()
+            if ',' in body or '-' in body:
+                for item in body.split(','):
+                    ends = item.split('-')
+                    if len(ends) > 2 or not all(end.isdigit() for end in ends):
+                        raise ValueError(f"Invalid rulestring '{rulestring}'.")
+                    numbers.update(range(int(ends[0]), int(ends[-1]) + 1))
+            elif body.isdigit() or not body:
+                numbers.update(map(int, body))
+            else:
+                raise ValueError(f"Invalid rulestring '{rulestring}'.")
+            counts[part[0]] = numbers
+        
+        if set(counts) != {'B', 'S'}:
+            raise ValueError(f"Invalid rulestring '{rulestring}'.")
+        return cls(counts['B'], counts['S'])
+    
+    
+    def __str__(self):
+        
+        def counts(numbers):
+            numbers = sorted(numbers)
+            if all(n < 10 for n in numbers):
+                return ''.join(map(str, numbers))
+            return ','.join(map(str, numbers))
+        
+        return f'B{counts(self.born)}/S{counts(self.survive)}'
+    
+    
+    def __repr__(self):
+        return f"Rule.parse('{self}')"
+    
+    
+def compile_rule(rules, size, adjacency, neighbours):
+    """ Compile a life function into a lookup table for a board, as a pair
+        of lists of booleans indexed by current state then by number of live
+        neighbours, from 0 up to the number of neighbours each cell has.
+        """
+    
+    return [
+            [bool(rules(size, adjacency, adj, state)) for adj in range(neighbours + 1)]
+            for state in (False, True)
+        ]
 
 
 configs = {
-        'conway': conway
+        'conway': conway,
+        'highlife': Rule.parse('B36/S23'),
+        'seeds': Rule.parse('B2/S'),
+        'day and night': Rule.parse('B3678/S34678'),
+        '3d 4555': Rule.parse('B5/S45'),
+        '3d 5766': Rule.parse('B6/S567')
     }
 
 
-b = Board((10,10), 2, conway, False)
+if __name__ == '__main__':
+    
+    b = Board((10,10), 2, conway, False)
 
-fill = (
-        (0,1), (1,1), (2,1),  # Blinker
-        (0,6), (1,6), (2,6), (1,7), (2,7), (3,7)  # Toad
-    )
+    fill = (
+            (0,1), (1,1), (2,1),  # Blinker
+            (0,6), (1,6), (2,6), (1,7), (2,7), (3,7)  # Toad
+        )
 
-for coord in fill:
-    b[coord] = True
+    for coord in fill:
+        b[coord] = True
 
-for i in range(10):
+    renderer = Renderer(lambda a, b: f'{"#" if a else ".": ^{b}}')
+    
+    for i in range(10):
     
-    b.update()
-    b.print_nd(lambda a, b: f'{"#" if a else ".": ^{b}}')
+        b.update()
+        renderer.draw(b)
    
-    sleep(1)
\ No newline at end of file
+        sleep(1)
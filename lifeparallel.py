@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import life
+from ngrid import np
+
+
+# Seconds between checks that the workers are still running
+POLL_INTERVAL = 0.1
+
+class ParallelLife:
+    """ Runs the Game of Life on a life.Board across several worker processes.
+        The board is held in a pair of shared memory buffers: each generation
+        is read from one and written to the other, and then they swap. Each
+        worker owns a slab of whole planes along the last dimension, and
+        works through it as the slab engine does. Halos are exchanged through
+        the shared buffers themselves: each generation is only started once
+        every worker has finished the last, so the edge planes of each slab
+        are ready for its neighbours to read as halos. Nothing but semaphores
+        signalling the start and end of each generation passes between
+        processes during a run.
+        Results are identical to the board's own engines. If a worker dies,
+        the workers are stopped, the shared memory is freed and a
+        RuntimeError is raised.
+        """
+
+    def __init__(self, board, processes=None, timeout=None):
+        """ The number of processes defaults to the number of cores, and is
+            limited to the size of the board's last dimension.
+            If a timeout is given, a generation taking longer than that many
+            seconds also counts as a failure.
+            """
+
+        if np is None:
+            raise ImportError('ParallelLife requires numpy.')
+
+        self.board = board
+        self.size = board.size
+        self.processes = max(1, min(processes or os.cpu_count(), self.size[-1]))
+
+        self.buffers = [shared_memory.SharedMemory(create=True, size=max(1, len(board))) for i in range(2)]
+        self.current = 0
+        self.state(0)[...] = board.to_ndarray(bool)
+
+        self.timeout = timeout
+        self.starts = [multiprocessing.Semaphore(0) for p in range(self.processes)]
+        self.done = multiprocessing.Semaphore(0)
+        self.stopping = multiprocessing.Value('b', 0, lock=False)
+
+        depth = self.size[-1]
+        bounds = [depth * p // self.processes for p in range(self.processes + 1)]
+        args = (self.buffers, self.size, board.get_rule_table(), board.adjacency, board.wrap,
+                board.count_dtype(), self.done, self.stopping)
+        self.workers = [
+                multiprocessing.Process(target=_worker, args=(start, stop, semaphore) + args, daemon=True)
+                for start, stop, semaphore in zip(bounds, bounds[1:], self.starts)
+            ]
+        for worker in self.workers:
+            worker.start()
+
+
+    def state(self, i):
+        """ Get one of the buffers as an n-dimensional array. """
+
+        return np.ndarray(self.size, bool, self.buffers[i].buf, order='F')
+
+
+    def advance(self, generations=1):
+        """ Advance by a number of generations. """
+
+        for i in range(generations):
+            # Let the workers start the generation, then wait for them all to finish
+            for semaphore in self.starts:
+                semaphore.release()
+            self.wait()
+            self.current ^= 1
+
+
+    def wait(self):
+        """ Wait for every worker to finish a generation, checking all the
+            while that they are still running.
+            """
+
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        for p in range(self.processes):
+            while not self.done.acquire(timeout=POLL_INTERVAL):
+                if any(worker.exitcode is not None for worker in self.workers):
+                    self.terminate()
+                    raise RuntimeError('A worker process stopped unexpectedly.')
+                if deadline is not None and time.monotonic() > deadline:
+                    self.terminate()
+                    raise RuntimeError(f'A generation took more than {self.timeout} seconds.')
+
+
+    def to_board(self):
+        """ Write the current generation back onto the board. """
+
+        self.board.set_ndarray(self.state(self.current).copy())
+        self.board.counts = None
+        self.board.reset_hash()
+
+
+    def close(self):
+        """ Stop the workers and free the shared memory. """
+
+        if self.workers is None:
+            return
+        self.stopping.value = 1
+        for semaphore in self.starts:
+            semaphore.release()
+        for worker in self.workers:
+            worker.join(self.timeout)
+        self.terminate()
+
+
+    def terminate(self):
+        """ Stop any workers still running by force, and free the shared memory. """
+
+        if self.workers is None:
+            return
+        for worker in self.workers:
+            if worker.exitcode is None:
+                worker.terminate()
+            worker.join()
+        self.workers = None
+
+        for buffer in self.buffers:
+            buffer.close()
+            buffer.unlink()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _worker(start, stop, semaphore, buffers, size, rule_table, adjacency, wrap, dtype, done, stopping):
+    """ Advance planes start to stop of the board each generation, until told to stop.
+        Each generation starts when the semaphore is released, and is
+        reported finished by releasing done.
+        """
+
+    states = [np.ndarray(size, bool, buffer.buf, order='F') for buffer in buffers]
+    table = np.array(rule_table)
+    current = 0
+
+    while True:
+        semaphore.acquire()
+        if stopping.value:
+            break
+        life._step_slabs(states[current], states[current ^ 1], start, stop, table, adjacency, wrap, dtype)
+        current ^= 1
+        done.release()
+
+    # Drop the arrays so the buffers can be closed
+    del states
+    for buffer in buffers:
+        buffer.close()
+
+
+def advance(board, generations, processes=None, timeout=None):
+    """ Advance a life.Board by a number of generations using several
+        worker processes.
+        """
+
+    with ParallelLife(board, processes, timeout) as parallel:
+        parallel.advance(generations)
+        parallel.to_board()
+        board.generation += generations
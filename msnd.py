@@ -7,19 +7,56 @@ Created on Sat Mar  7 19:48:07 2020
 """
 
 from adjgrid import AdjGrid
+from bitboard import Bitboard
+from ngrid import np
+import instrument
 
 import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from boundedinput import read_tuple, select_one, read_int, read_float
 from editdefaults import fill
 
 class Tile():
-    """ A structure representing a single tile, and useful information about it. """
+    """ A view of a single tile on a Board, and useful information about it.
+        The information itself is stored by the board, one array per field.
+        """
     
-    def __init__(self, is_mine, visibility):
-        self.is_mine = is_mine
-        self.visibility = visibility
-        self.neighbours = []
-        self.mines = 0
+    __slots__ = ('board', 'index')
+    
+    def __init__(self, board, index):
+        self.board = board
+        self.index = index
+        
+    @property
+    def is_mine(self):
+        return self.board.is_mine[self.index]
+    
+    @is_mine.setter
+    def is_mine(self, value):
+        self.board.set_mine(self.index, value)
+        
+    @property
+    def visibility(self):
+        return self.board.visibility[self.index]
+    
+    @visibility.setter
+    def visibility(self, value):
+        self.board.set_visibility(self.index, value)
+        
+    @property
+    def mines(self):
+        return self.board.mines[self.index]
+    
+    @property
+    def neighbours(self):
+        return [Tile(self.board, i) for i in self.board.get_neighbour_indices(self.index)]
+    
+    def __eq__(self, other):
+        return isinstance(other, Tile) and self.board is other.board and self.index == other.index
+    
+    def __hash__(self):
+        return hash((id(self.board), self.index))
     
     def __str__(self, width=2):
         """ Print the tile in a useful format. """
@@ -32,81 +69,151 @@ class Tile():
         else:
             out = '@' if self.visibility == 2 else '#'
         return f'{out: ^{width}}'
+    
 
-class Board(AdjGrid):
-    """ An n-dimensional minesweeper board. """
+class Tiles():
+    """ The sequence of Tile views making up a Board. """
     
-    def __init__(self, size, adjacency, mine_frac):
+    def __init__(self, board):
+        self.board = board
         
+    def __len__(self):
+        return len(self.board.is_mine)
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [Tile(self.board, i) for i in range(len(self))[key]]
+        if not -len(self) <= key < len(self):
+            raise IndexError('Tile index out of range.')
+        return Tile(self.board, key % len(self))
+    
+
+class Board(AdjGrid):
+    """ An n-dimensional minesweeper board.
+        Each field of the tiles is held in its own compact array, indexed by
+        position on the board: is_mine and visibility in bytearrays, and the
+        number of adjacent mines in an array of unsigned integers.
+        Neighbours are worked out tile by tile rather than from a neighbour
+        table, which would take far more memory than the board itself, and
+        indexing the board gives Tile views onto these arrays.
+        Counts of safe tiles and of revealed safe tiles are kept up to date
+        as tiles change, so that checking for a win takes constant time.
+        """
+    
+    def __init__(self, size, adjacency, mine_frac, boundary='clip', seed=None, chunks=1, processes=1):
+        """ Exactly round(mine_frac * number of squares) mines are placed.
+            The seed may be None, an integer, a random.Random or a numpy
+            Generator, and the same seed always gives the same board.
+            For very large boards, mines can be placed in a number of chunks
+            spread across processes (see place_mines).
+            """
         
         # Determine number of squares
         length = 1
         for dim in size: length *= dim
         
+        # Random numbers used after the mines are placed
+        self.random = seed if isinstance(seed, random.Random) else random.Random(_derive_seed(seed))
+        
         # Create board
-        board = []
-        for i in range(length):
-            board.append(Tile(random.random()<mine_frac, 0))
+        self.is_mine = place_mines(length, round(mine_frac * length), seed, chunks, processes)
+        self.visibility = bytearray(length)
+        self.safe = length - self.is_mine.count(1)
+        self.revealed = 0
         
         # Initialise the NGrid superclass
-        super().__init__(size, adjacency, board)
+        super().__init__(size, adjacency, Tiles(self), boundary=boundary)
         
         
         self.update_neighbours()
         
         
-    def update_neighbours(self):
-        # Set neighbours
+    def get_neighbour_indices(self, index):
+        """ Get the array indices of all neighbours of a given array index,
+            in the same order as get_neighbours. Interior tiles add the deltas
+            to their index, and only tiles on the border need their
+            neighbours checked against the edges.
+            """
         
-        for i in range(len(self)):
-            self[i].mines = 0
+        coord = self.from_linear(index)
+        if self.is_interior(coord):
+            return [index + delta for delta in self.deltas]
+        return [self.to_linear(neighbour) for neighbour in self.get_neighbours(coord)]
         
-        for i in range(len(self)):
-            neighbours = self.get_neighbours(self.from_linear(i))
-            for neighbour in neighbours:
-                neighbour = self[neighbour]
-                self[i].neighbours.append(neighbour)
-                if neighbour.is_mine:
-                    self[i].mines += 1
-
+        
+    def cell_layers(self):
+        """ Get the packed arrays that together decide how each tile is
+            drawn, so that a Renderer can find the changed tiles from them.
+            """
+        
+        return self.is_mine, self.visibility, self.mines
+        
+        
+    def update_neighbours(self):
+        """ Count the mines adjacent to every tile, all at once, with the
+            mines packed into a bitboard.
+            """
+        
+        typecode = 'B' if len(self.offsets) < 256 else 'H'
+        bitboard = Bitboard(self.size, self.wrap)
+        planes = bitboard.neighbour_counts(bitboard.pack(self.is_mine), self.adjacency)
+        self.mines = bitboard.counts(planes, typecode)
             
     
+    def set_mine(self, index, is_mine):
+        """ Set whether a tile is a mine, keeping the counts of safe tiles.
+            The numbers of adjacent mines are left unchanged.
+            """
+        
+        is_mine = bool(is_mine)
+        if is_mine != self.is_mine[index]:
+            change = -1 if is_mine else 1
+            self.safe += change
+            if self.visibility[index] == 1:
+                self.revealed += change
+            self.is_mine[index] = is_mine
+    
+    
+    def set_visibility(self, index, visibility):
+        """ Set the visibility of a tile, keeping the count of revealed safe tiles. """
+        
+        if not self.is_mine[index] and (visibility == 1) != (self.visibility[index] == 1):
+            self.revealed += 1 if visibility == 1 else -1
+        self.visibility[index] = visibility
+    
+    
     def sweep(self, update=None):
         """ Mark as visible any square whose neighbour has no adjacent mines.
-            For efficiency, the update parameter can be used to mark the tiles
-            that have been updated, allowing the function to ignore the others.
+            The reveal spreads outwards as a flood fill, starting from
+            the visible tiles among those in update (given as array indices),
+            or from all visible tiles if update is not specified.
             """
         
+        get_neighbour_indices = self.get_neighbour_indices
+        visibility = self.visibility
+        mines = self.mines
+        
         # If the updated tiles are not specified, assume that they may all be updated
         if update is None:
-            update = set(self)
-        else:
-            update = set(update)
+            update = range(len(self))
         
-        while update:
+        # The frontier of visible tiles with no adjacent mines left to expand
+        frontier = deque(i for i in update if visibility[i] == 1 and mines[i] == 0)
+        
+        while frontier:
+            i = frontier.popleft()
             
-            # Apply the sweep algorithm at each updated tile
-            update_next = set()
-            for tile in update:
-                
-                # If a tile is visible, and has no adjacent mines, make all neighbours visible
-                if tile.visibility == 1 and tile.mines == 0:
-                    for neighbour in tile.neighbours:
-                        if neighbour.visibility != 1:
-                            neighbour.visibility = 1
-                            
-                            # Mark these neighbours for update next iteration
-                            update_next.add(neighbour)
-                            
-            update = update_next
+            # Make all neighbours visible, and continue from those with no adjacent mines
+            for neighbour in get_neighbour_indices(i):
+                if visibility[neighbour] != 1:
+                    self.set_visibility(neighbour, 1)
+                    if mines[neighbour] == 0:
+                        frontier.append(neighbour)
         
         
     def is_won(self):
         """ Check if all non-mine squares are cleared. """
-        for tile in self:
-            if not tile.is_mine and tile.visibility != 1:
-                return False
-        return True
+        return self.revealed == self.safe
     
     
     def print_(self):
@@ -114,18 +221,125 @@ class Board(AdjGrid):
         
         
     def move(self, coord):
-        self[coord].visibility = True
-        self.sweep()
+        index = self.to_linear(coord)
+        self.set_visibility(index, 1)
+        self.sweep((index,))
         
         
     def first_move(self, coord):
-        self[coord].is_mine = False
-        for tile in self[coord].neighbours:
-            tile.is_mine = False
-        self.update_neighbours()
+        """ Make a first move that can neither hit a mine nor reveal a number,
+            by moving any mines on or next to the chosen tile elsewhere.
+            Only the mine counts around the moved mines are changed.
+            """
+        
+        # The chosen tile and its neighbours, found from the coordinate alone
+        index = self.to_linear(coord)
+        cleared = {index}
+        cleared.update(self.to_linear(neighbour) for neighbour in self.get_neighbours(coord))
+        
+        displaced = [i for i in cleared if self.is_mine[i]]
+        for i in displaced:
+            self.place_mine(i, False)
+        for i in displaced:
+            new_index = self.random_clear_tile(cleared)
+            if new_index is not None:
+                self.place_mine(new_index, True)
+            
         self.move(coord)
         
+        
+    def place_mine(self, index, is_mine):
+        """ Add or remove a mine, updating the counts of adjacent mines.
+            Only the tiles around this one are looked at.
+            """
+        
+        if bool(is_mine) != bool(self.is_mine[index]):
+            self.set_mine(index, is_mine)
+            change = 1 if is_mine else -1
+            for neighbour in self.get_neighbour_indices(index):
+                self.mines[neighbour] += change
+        
+        
+    def random_clear_tile(self, excluded=()):
+        """ Choose a random tile with no mine, other than any in excluded.
+            Returns None if there is no such tile.
+            """
+        
+        # Guessing is fast unless the board is nearly full of mines
+        for attempt in range(64):
+            index = self.random.randrange(len(self))
+            if not self.is_mine[index] and index not in excluded:
+                return index
+        
+        candidates = [i for i in range(len(self)) if not self.is_mine[i] and i not in excluded]
+        return self.random.choice(candidates) if candidates else None
+        
+
+
+
+def place_mines(length, count, seed=None, chunks=1, processes=1):
+    """ Choose exactly count of length squares uniformly at random to be mines,
+        returning a bytearray holding 1 for each mine.
+        With numpy, the mines are sampled in bulk. The board can also be split
+        into a number of chunks, each given its share of the mines at random
+        and then filled in using its own seed derived from the main one, so
+        that chunks can be filled in parallel by the given number of worker
+        processes. The result depends on the seed and number of chunks,
+        but not on the number of processes.
+        """
+    
+    if np is None:
+        if chunks != 1:
+            raise ImportError('Placing mines in chunks requires numpy.')
+        rng = seed if isinstance(seed, random.Random) else random.Random(_derive_seed(seed))
+        is_mine = bytearray(length)
+        for index in rng.sample(range(length), count):
+            is_mine[index] = 1
+        return is_mine
+    
+    seeds = np.random.SeedSequence(_derive_seed(seed))
+    
+    if chunks == 1:
+        return _place_chunk((length, count, seeds))
+    
+    # Share out the mines between the chunks as if they were placed at random
+    bounds = [length * i // chunks for i in range(chunks + 1)]
+    lengths = [end - start for start, end in zip(bounds, bounds[1:])]
+    counts = np.random.default_rng(seeds).multivariate_hypergeometric(lengths, count, method='marginals')
+    tasks = list(zip(lengths, counts.tolist(), seeds.spawn(chunks)))
+    
+    if processes == 1:
+        parts = map(_place_chunk, tasks)
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            parts = list(executor.map(_place_chunk, tasks))
+    
+    is_mine = bytearray()
+    for part in parts:
+        is_mine += part
+    return is_mine
+
+
+def _place_chunk(task):
+    """ Place mines in one chunk of a board, given (length, count, seed). """
+    
+    length, count, seed = task
+    is_mine = bytearray(length)
+    np.frombuffer(is_mine, dtype=np.uint8)[np.random.default_rng(seed).choice(length, count, replace=False)] = 1
+    return is_mine
+
+
+def _derive_seed(seed):
+    """ Turn any accepted kind of seed into an integer, or None. """
+    
+    if isinstance(seed, random.Random):
+        return seed.getrandbits(128)
+    if np is not None and isinstance(seed, np.random.Generator):
+        return int(seed.integers(2**63))
+    return seed
+
 
+instrument.install('msnd', globals())
 
 
 configs = {
@@ -134,6 +348,7 @@ configs = {
         'Easy 2d': {'size':(10,10), 'mine_frac':0.2, 'adjacency':2},
         'Normal 2d': {'size':(20,15), 'mine_frac':0.25, 'adjacency':2},
         'Hard 2d': {'size':(25,20), 'mine_frac':0.3, 'adjacency':2},
+        'Normal 2d torus': {'size':(20,15), 'mine_frac':0.25, 'adjacency':2, 'boundary':'wrap'},
         
         'Easy 4d': {'size':(4,4,3,3), 'mine_frac':0.2, 'adjacency':2},
         'Normal 4d': {'size':(4,4,4,4), 'mine_frac':0.25, 'adjacency':2},
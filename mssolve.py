@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import msnd
+
+
+class Solver:
+    """ Plays a minesweeper Board without looking at hidden tiles.
+        Each turn, constraints are read from the revealed numbers: the hidden
+        neighbours of a number hold exactly that many mines, less any already
+        flagged. Tiles are then proven safe or mines by, in order:
+            - single constraints with no mines left, or only mines left,
+            - pairs of overlapping constraints, comparing the mines that
+              can fit in their shared and unshared tiles,
+        and if nothing can be proven, the tile least likely to be a mine
+        is guessed.
+        """
+
+    def __init__(self, board, seed=None):
+        self.board = board
+        self.random = random.Random(seed)
+        self.guesses = 0
+        self.lost = False
+
+        # Numbered tiles that may still have hidden neighbours
+        self.numbers = set()
+
+
+    def is_hidden(self, index):
+        return self.board.visibility[index] == 0
+
+
+    def is_flagged(self, index):
+        return self.board.visibility[index] == 2
+
+
+    def reveal(self, index):
+        """ Reveal a tile, noting any numbers uncovered. """
+
+        board = self.board
+        before = board.revealed
+        board.move(board.from_linear(index))
+
+        if board.is_mine[index]:
+            self.lost = True
+            return
+
+        # Look for new numbers around the revealed area
+        if board.revealed - before == 1:
+            uncovered = [index]
+        else:
+            uncovered = self.uncovered_from(index)
+        for i in uncovered:
+            if board.mines[i]:
+                self.numbers.add(i)
+
+
+    def uncovered_from(self, index):
+        """ Find the tiles uncovered by a flood fill from a tile. """
+
+        board = self.board
+        seen = {index}
+        stack = [index]
+        while stack:
+            i = stack.pop()
+            if board.mines[i]:
+                continue
+            for neighbour in board.get_neighbour_indices(i):
+                if neighbour not in seen and board.visibility[neighbour] == 1:
+                    seen.add(neighbour)
+                    stack.append(neighbour)
+        return seen
+
+
+    def constraints(self):
+        """ Get the constraints from the revealed numbers, as a dict of
+            {frozenset of hidden tiles: number of mines among them}.
+            """
+
+        board = self.board
+        constraints = {}
+        finished = []
+
+        for i in self.numbers:
+            hidden = []
+            mines = board.mines[i]
+            for neighbour in board.get_neighbour_indices(i):
+                if self.is_hidden(neighbour):
+                    hidden.append(neighbour)
+                elif self.is_flagged(neighbour):
+                    mines -= 1
+            if hidden:
+                constraints[frozenset(hidden)] = mines
+            else:
+                finished.append(i)
+
+        self.numbers.difference_update(finished)
+        return constraints
+
+
+    def deduce(self, constraints):
+        """ Find the tiles proven safe and those proven to be mines. """
+
+        safe = set()
+        mines = set()
+
+        for cells, count in constraints.items():
+            if count == 0:
+                safe |= cells
+            elif count == len(cells):
+                mines |= cells
+
+        if safe or mines:
+            return safe, mines
+
+        # Compare pairs of constraints sharing a tile
+        by_cell = {}
+        for cells in constraints:
+            for cell in cells:
+                by_cell.setdefault(cell, []).append(cells)
+
+        for a, count_a in constraints.items():
+            others = set()
+            for cell in a:
+                others.update(by_cell[cell])
+            others.discard(a)
+
+            for b in others:
+                count_b = constraints[b]
+                shared = a & b
+                only_b = b - a
+                if not only_b:
+                    continue
+
+                # Bounds on the mines among the shared tiles, as seen from a
+                most_shared = min(len(shared), count_a, count_b)
+                least_shared = max(0, count_a - len(a - b))
+
+                if count_b - least_shared == 0:
+                    safe |= only_b
+                elif count_b - most_shared == len(only_b):
+                    mines |= only_b
+
+        return safe, mines
+
+
+    def guess(self, constraints):
+        """ Choose the hidden tile least likely to be a mine.
+            Tiles next to numbers are rated by the most pessimistic of their
+            constraints, and all other hidden tiles by the density of the
+            mines left over.
+            """
+
+        board = self.board
+        risk = {}
+        for cells, count in constraints.items():
+            for cell in cells:
+                risk[cell] = max(risk.get(cell, 0), count / len(cells))
+
+        hidden = [i for i in range(len(board)) if self.is_hidden(i)]
+        others = [i for i in hidden if i not in risk]
+
+        if others:
+            flagged = sum(1 for i in range(len(board)) if self.is_flagged(i))
+            expected = sum(risk.values())
+            mines_left = len(board) - board.safe - flagged
+            density = max(0, mines_left - expected) / len(others)
+        else:
+            density = 1
+
+        best = min(risk.values(), default=1)
+        if others and density <= best:
+            return self.random.choice(others)
+        return self.random.choice([cell for cell, value in risk.items() if value == best])
+
+
+    def play(self, start=None):
+        """ Play the game to the end, starting with a safe first move
+            (at the centre by default). Returns True if the game is won.
+            """
+
+        board = self.board
+        if start is None:
+            start = tuple(dim // 2 for dim in board.size)
+
+        board.first_move(start)
+        index = board.to_linear(start)
+        for i in self.uncovered_from(index):
+            if board.mines[i]:
+                self.numbers.add(i)
+
+        while not board.is_won() and not self.lost:
+            constraints = self.constraints()
+            safe, mines = self.deduce(constraints)
+
+            for i in mines:
+                board.set_visibility(i, 2)
+
+            if not safe and not mines:
+                self.guesses += 1
+                safe = {self.guess(constraints)}
+
+            for i in safe:
+                if self.is_hidden(i):
+                    self.reveal(i)
+                    if self.lost:
+                        break
+
+        return not self.lost
+
+
+def solve_game(config, seed):
+    """ Play one seeded game of a board configuration,
+        returning (won, guesses, time taken).
+        """
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    board = msnd.Board(seed=rng.getrandbits(64), **config)
+    solver = Solver(board, rng.getrandbits(64))
+    won = solver.play()
+    return won, solver.guesses, time.perf_counter() - start
+
+
+def _solve_game(args):
+    return solve_game(*args)
+
+
+def run(configs, games=1000, seed=0, processes=None):
+    """ Solve many seeded games of each configuration across a pool of
+        worker processes, and report the win rate, guesses per game and
+        solve time for each.
+        Configurations are given as a dict of {name: msnd.Board arguments}.
+        """
+
+    rng = random.Random(seed)
+    processes = processes or os.cpu_count()
+    reports = {}
+
+    executor = ProcessPoolExecutor(processes) if processes > 1 else None
+    try:
+        for name, config in configs.items():
+            tasks = [(config, rng.getrandbits(64)) for i in range(games)]
+
+            start = time.perf_counter()
+            if executor is None:
+                results = list(map(_solve_game, tasks))
+            else:
+                results = list(executor.map(_solve_game, tasks, chunksize=max(1, games // (4 * processes))))
+            elapsed = time.perf_counter() - start
+
+            wins = sum(won for won, guesses, taken in results)
+            times = [taken for won, guesses, taken in results]
+            reports[name] = {
+                    'size': list(config['size']),
+                    'dimensions': len(config['size']),
+                    'adjacency': config['adjacency'],
+                    'mine_frac': config['mine_frac'],
+                    'games': games,
+                    'wins': wins,
+                    'win_rate': wins / games,
+                    'guesses_mean': statistics.fmean(guesses for won, guesses, taken in results),
+                    'time_mean': statistics.fmean(times),
+                    'time_median': statistics.median(times),
+                    'games_per_sec': games / elapsed
+                }
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return reports
+
+
+def main(argv=None):
+
+    presets = [name for name in msnd.configs if msnd.configs[name] is not None]
+
+    parser = argparse.ArgumentParser(description='Solve many minesweeper games and report on them.')
+    parser.add_argument('--configs', nargs='+', default=presets, choices=presets,
+                        help='the msnd presets to solve (all by default)')
+    parser.add_argument('--size', type=int, nargs='+', help='solve a custom board of this size instead')
+    parser.add_argument('--adjacency', type=int, default=2)
+    parser.add_argument('--mine-frac', type=float, default=0.2)
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='defaults to the number of cores')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args(argv)
+
+    if args.size:
+        configs = {'Custom': {'size': tuple(args.size), 'adjacency': args.adjacency, 'mine_frac': args.mine_frac}}
+    else:
+        configs = {name: msnd.configs[name] for name in args.configs}
+
+    reports = run(configs, args.games, args.seed, args.processes)
+
+    print(json.dumps(reports, indent=4))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(reports, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,22 +7,87 @@ Created on Mon Mar  9 00:50:53 2020
 """
 
 import itertools as it
+import operator
+import os
+import sys
+from operator import mul
+import instrument
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class NGrid:
     """ Generic n-dimensional board class used across multiple games. """
     
     
     
-    def __init__(self, size, array=None):
-        self.size = size
+    def __init__(self, size, array=None, storage='list', dtype=None, path=None):
+        """ The storage parameter selects how the cells are held:
+            'list' keeps a plain Python list, while 'numpy' keeps a flat
+            ndarray (optionally of the given dtype) that can also be viewed
+            as an n-dimensional array.
+            'mmap' is like 'numpy', but the ndarray is memory-mapped from the
+            file at path, so the board can be larger than memory. If no array
+            is given and the file already exists, the board is opened from it,
+            otherwise the file is created and filled from the array.
+            """
+        
+        self.size = tuple(size)
+        self.storage = storage
+        self.path = path
         
-        if hasattr(array, '__len__'):
-            self.array = array
+        # Cache the multiplier for each dimension, used to convert coordinates
+        self.strides = []
+        length = 1
+        for dim in self.size:
+            self.strides.append(length)
+            length *= dim
+        self.strides = tuple(self.strides)
+        
+        if storage == 'list':
+            if hasattr(array, '__len__'):
+                self.array = array
+            else:
+                self.array = [array] * length
+                
+        elif storage == 'numpy':
+            if np is None:
+                raise ImportError("The 'numpy' storage mode requires numpy.")
+            if hasattr(array, '__len__'):
+                # n-dimensional arrays are indexed by coordinate, so flatten
+                # them with the first dimension varying fastest
+                self.array = np.asarray(array, dtype=dtype).reshape(-1, order='F')
+                if len(self.array) != length:
+                    raise ValueError(f'Array must have {length} cells, not {len(self.array)}.')
+            else:
+                self.array = np.full(length, array, dtype=dtype)
+                
+        elif storage == 'mmap':
+            if np is None:
+                raise ImportError("The 'mmap' storage mode requires numpy.")
+            if path is None:
+                raise ValueError("The 'mmap' storage mode requires a path.")
+            dtype = np.dtype(dtype if dtype is not None else float)
+            
+            if isinstance(array, np.memmap) and array.filename == os.path.abspath(path):
+                # Already mapped from this file, as when loading a saved board
+                self.array = array
+            elif array is None and os.path.exists(path):
+                self.array = np.memmap(path, dtype, 'r+')
+            else:
+                self.array = np.memmap(path, dtype, 'w+', shape=(length,))
+                if hasattr(array, '__len__'):
+                    self.array[:] = np.asarray(array, dtype=dtype).reshape(-1, order='F')
+                elif array:
+                    self.array[:] = array
+            if len(self.array) != length:
+                raise ValueError(f'Array must have {length} cells, not {len(self.array)}.')
+                
         else:
-            length = 1
-            for dim in size:
-                length *= dim
-            self.array = [array] * length
+            raise ValueError(f"Unknown storage mode '{storage}'.")
     
     
     def __len__(self):
@@ -36,92 +101,358 @@ class NGrid:
             position on this array.
             """
             
-        index = 0
-        multiplier = 1
-        for dim in range(len(self.size)):
-            index += coord[dim] * multiplier
-            multiplier *= self.size[dim]
-        return index
+        return sum(map(mul, coord, self.strides))
     
     
     def from_linear(self, index):
         """ Converts an internal array index to an n-dimensional coordinate. """
         
         coord = []
-        for dim in range(len(self.size)):
-            coord.append(index % self.size[dim])
-            index //= self.size[dim]
+        for dim in self.size:
+            coord.append(index % dim)
+            index //= dim
         return tuple(coord)
     
     
+    def cell_index(self, key):
+        """ Get the array index of the single cell a key picks out, where the
+            key is an array index or an n-dimensional coordinate, or None for
+            any other key (such as a slice or an ndarray).
+            Raises IndexError for an array index out of range or a coordinate
+            with the wrong number of dimensions.
+            """
+        
+        if np is not None and isinstance(key, np.ndarray):
+            return None
+        try:
+            index = operator.index(key)
+        except TypeError:
+            pass
+        else:
+            if not -len(self) <= index < len(self):
+                raise IndexError('Cell index out of range.')
+            return index % len(self)
+        
+        try:
+            coord = tuple(key)
+        except TypeError:
+            return None
+        if len(coord) != len(self.size):
+            raise IndexError(f'Coordinate {coord} should have {len(self.size)} dimensions.')
+        return self.to_linear(coord)
+    
+    
+    def coords(self):
+        """ Iterate over every cell as (array index, coordinate), in array
+            order. Coordinates are stepped along like an odometer, with the
+            first dimension turning fastest, rather than each being worked
+            out from its index.
+            """
+        
+        for index, coord in enumerate(it.product(*map(range, reversed(self.size)))):
+            yield index, coord[::-1]
+    
+    
+    def to_linear_many(self, coords):
+        """ Converts a (k, n) array of coordinates to k array indices at once. """
+        
+        return np.asarray(coords, dtype=np.intp) @ np.array(self.strides, dtype=np.intp)
+    
+    
+    def from_linear_many(self, indices):
+        """ Converts an array of k array indices to a (k, n) array of coordinates. """
+        
+        indices = np.asarray(indices, dtype=np.intp)
+        return (indices[:, None] // np.array(self.strides, dtype=np.intp)) % np.array(self.size, dtype=np.intp)
+    
+    
+    @property
+    def view(self):
+        """ The board as an n-dimensional ndarray sharing memory with the
+            flat array, so board[coord] == board.view[coord].
+            Only available with numpy or mmap storage.
+            """
+            
+        if self.storage == 'list':
+            raise ValueError('An n-dimensional view requires numpy or mmap storage.')
+        return self.array.reshape(self.size, order='F')
+    
+    
+    def to_ndarray(self, dtype=None):
+        """ Get the board as an n-dimensional ndarray.
+            With numpy or mmap storage this is a view where possible,
+            otherwise a copy.
+            """
+        
+        if self.storage != 'list':
+            return self.view if dtype is None else self.view.astype(dtype, copy=False)
+        return np.array(self.array, dtype=dtype).reshape(self.size, order='F')
+    
+    
+    def set_ndarray(self, array):
+        """ Replace the contents of the board with an n-dimensional ndarray.
+            Memory-mapped boards are written in place.
+            """
+        
+        flat = np.asarray(array).reshape(-1, order='F')
+        if self.storage == 'mmap':
+            self.array[:] = flat
+        elif self.storage == 'numpy':
+            self.array = flat
+        else:
+            self.array = flat.tolist()
+    
+    
     def __getitem__(self, key):
         """ Allow this class to be indexed.
             Integers and slices can be used like regular lists,
             and iterables can be used to specify n-dimensional coordinates.
             """
             
+        # Handle (k, n) arrays as k n-dimensional coordinates
+        if np is not None and isinstance(key, np.ndarray) and key.ndim == 2:
+            indices = self.to_linear_many(key)
+            if self.storage != 'list':
+                return self.array[indices]
+            return [self.array[i] for i in indices]
+        
         try:
             # Handle iterables as n-dimensional coordinates
             t_key = tuple(key)
+            if len(t_key) != len(self.size):
+                raise IndexError(f'Coordinate {t_key} should have {len(self.size)} dimensions.')
             return self.array[self.to_linear(t_key)]
         except TypeError:
             # Leave anything else to the normal list __getitem__
             return self.array[key]
         
     def __setitem__(self, key, value):
+        if np is not None and isinstance(key, np.ndarray) and key.ndim == 2:
+            indices = self.to_linear_many(key)
+            if self.storage != 'list':
+                self.array[indices] = value
+            else:
+                values = value if hasattr(value, '__len__') else [value] * len(indices)
+                for i, v in zip(indices, values):
+                    self.array[i] = v
+            return
+        
         try:
             # Handle iterables as n-dimensional coordinates
             t_key = tuple(key)
+            if len(t_key) != len(self.size):
+                raise IndexError(f'Coordinate {t_key} should have {len(self.size)} dimensions.')
             self.array[self.to_linear(t_key)] = value
         except TypeError:
             # Leave anything else to the normal list __getitem__
             self.array[key] = value
         
+    def flush(self):
+        """ Write any changes to a memory-mapped board out to its file. """
+        
+        if self.storage == 'mmap':
+            self.array.flush()
+        
+        
+    def window(self, ranges):
+        """ Get a Window onto part of the board. """
+        
+        return Window(self, ranges)
+    
+    
+    def summary(self, block, func=bool):
+        """ Get a smaller board giving the fraction of cells in each block of
+            the board for which func is true. The block is a size in each
+            dimension, and blocks at the far edges may be cut short.
+            This is computed in bulk with numpy where possible.
+            """
+        
+        block = tuple(block)
+        size = tuple(-(-dim // b) for dim, b in zip(self.size, block))
+        
+        if np is not None and func is bool and isinstance(self.array, (list, np.ndarray)):
+            cells = self.to_ndarray().astype(bool)
+            
+            # Pad to whole blocks, then give each block its own pair of axes
+            pad = [(0, n * b - dim) for n, b, dim in zip(size, block, self.size)]
+            shape = [x for n, b in zip(size, block) for x in (n, b)]
+            block_axes = tuple(range(1, 2 * len(size), 2))
+            counts = np.pad(cells, pad).reshape(shape).sum(axis=block_axes)
+            totals = np.pad(np.ones(self.size, dtype=bool), pad).reshape(shape).sum(axis=block_axes)
+            return NGrid(size, counts / totals, 'numpy')
+        
+        summary = NGrid(size, 0)
+        totals = NGrid(size, 0)
+        for i, coord in self.coords():
+            target = summary.to_linear([c // b for c, b in zip(coord, block)])
+            totals.array[target] += 1
+            if func(self[i]):
+                summary.array[target] += 1
+        summary.array = [count / total for count, total in zip(summary.array, totals.array)]
+        return summary
+        
+        
     def print_nd(self, func, width=3):
         """ Print the n-dimensional board as a series of (up to) 4d grids.
             Each 4d grid is a 2d grid of 2d grids.
             """
         
-        adj_size = self.size  + (1,) * (4 - len(self.size))
+        sys.stdout.write(self.render_nd(func, width))
         
         
+    def render_nd(self, func, width=3):
+        """ Get the text printed by print_nd as a single string. """
+        
+        adj_size = self.size  + (1,) * (4 - len(self.size))
+        lines = []
+        
         for other_coord in it.product(*map(range,adj_size[4:])):
             
-            print(f'Showing coordinates {other_coord} + (*,*,*,*):')
+            lines.append(f'Showing coordinates {other_coord} + (*,*,*,*):')
             
-            self.print_row_coord(adj_size, width)
-            self.print_row_sep(adj_size, width)
+            self.render_row_coord(lines, adj_size, width)
+            self.render_row_sep(lines, adj_size, width)
             
             for w in range(adj_size[3]):
                 for y in range(adj_size[1]):
                     
-                    self.print_row(
+                    self.render_row(
+                            lines,
                             adj_size,
                             lambda z, x: func(self[((z,)+(y,)+(x,)+(w,))[:len(self.size)] + other_coord], width),
                             f'w={w: <{width}} y={y: <{width}}',
                             ' | ', ' | ', ' '
                          )
                     
-                self.print_row_sep(adj_size, width)
-            print()
+                self.render_row_sep(lines, adj_size, width)
+            lines.append('')
+        
+        lines.append('')
+        return '\n'.join(lines)
             
           
-    def print_row(self, size, func, start, border, z_sep, x_sep):
-        print(end=f'{start}{border}')
+    def render_row(self, lines, size, func, start, border, z_sep, x_sep):
+        """ Add one line of text to a list of lines. """
+        
+        parts = [start, border]
         for x in range(size[2]):
             if x > 0:
-                print(end=z_sep)
+                parts.append(z_sep)
             for z in range(size[0]):
                 if z > 0:
-                    print(end=x_sep)
-                print(end=func(z,x))
-        print(border)
+                    parts.append(x_sep)
+                parts.append(func(z,x))
+        parts.append(border)
+        lines.append(''.join(parts))
+        
+        
+    def render_row_coord(self, lines, size, width):
+        self.render_row(lines, size, lambda z, x: f'{z: ^{width}}', f'{"w -> ": <{2*width + 5}}', ' . ', ' . ', ' ')
+        self.render_row(lines, size, lambda z, x: f'{x: ^{width}}', f'{"y -> ": <{2*width + 5}}', ' | ', ' | ', ' ')
+        
+        
+    def render_row_sep(self, lines, size, width):
+        self.render_row(lines, size, lambda z, x: '-'*width, '-' * (2*width + 5), ' + ', ' + ', '-')
+        
+        
+    def cell_position(self, index, width=3):
+        """ Get the (line, column) at which render_nd puts a cell,
+            counting from zero, assuming each cell is drawn width wide.
+            """
+        
+        coord = self.from_linear(index)
+        adj_size = self.size  + (1,) * (4 - len(self.size))
+        z, y, x, w = (coord + (0,) * 4)[:4]
+        
+        # Find which of the 4d grids the cell is in
+        block = 0
+        for dim in range(4, len(adj_size)):
+            block = block * adj_size[dim] + coord[dim]
+        block_lines = 5 + adj_size[3] * (adj_size[1] + 1)
+        
+        line = block * block_lines + 4 + w * (adj_size[1] + 1) + y
+        column = (2*width + 5) + 3 + x * (adj_size[0] * (width + 1) + 2) + z * (width + 1)
+        return line, column
+
+
+
+class Window(NGrid):
+    """ A view of a rectangular part of a board, which can be printed
+        (or rendered) like any board while only reading the cells inside it.
+        Only the cells in the window are ever looked at, so the time taken
+        depends on the size of the window rather than of the board.
+        """
+    
+    def __init__(self, grid, ranges):
+        """ Ranges are given for each dimension of the board, as any of:
+            None, for the whole dimension,
+            an integer, to fix the coordinate and drop the dimension,
+            a (start, stop) pair, or a range or slice.
+            """
+        
+        if len(ranges) != len(grid.size):
+            raise ValueError(f'Ranges must be length {len(grid.size)} not {len(ranges)}.')
+        
+        self.grid = grid
+        self.ranges = []
+        for dim, r in zip(grid.size, ranges):
+            if r is None:
+                r = range(dim)
+            elif isinstance(r, slice):
+                r = range(dim)[r]
+            elif isinstance(r, tuple):
+                r = range(*r)
+            elif not isinstance(r, range):
+                r = int(r)
+                
+            if isinstance(r, int):
+                if not 0 <= r < dim:
+                    raise ValueError(f'Coordinate {r} is not within 0 and {dim}.')
+            elif r and not (0 <= min(r) and max(r) < dim):
+                raise ValueError(f'Range {r} is not within 0 and {dim}.')
+            self.ranges.append(r)
+        
+        super().__init__([len(r) for r in self.ranges if isinstance(r, range)], WindowCells(self))
         
         
-    def print_row_coord(self, size, width):
-        self.print_row(size, lambda z, x: f'{z: ^{width}}', f'{"w -> ": <{2*width + 5}}', ' . ', ' . ', ' ')
-        self.print_row(size, lambda z, x: f'{x: ^{width}}', f'{"y -> ": <{2*width + 5}}', ' | ', ' | ', ' ')
+    def board_coord(self, coord):
+        """ Convert a coordinate in the window to one on the board. """
+        
+        coord = iter(coord)
+        return tuple(r if isinstance(r, int) else r[next(coord)] for r in self.ranges)
+    
+    
+    def __getitem__(self, key):
+        try:
+            return self.grid[self.board_coord(tuple(key))]
+        except TypeError:
+            return self.array[key]
+        
         
+    def __setitem__(self, key, value):
+        try:
+            self.grid[self.board_coord(tuple(key))] = value
+        except TypeError:
+            self.grid[self.board_coord(self.from_linear(key))] = value
+            
+            
+class WindowCells:
+    """ The cells of a Window, as a sequence fetching each cell on demand. """
+    
+    def __init__(self, window):
+        self.window = window
         
-    def print_row_sep(self, size, width):
-        self.print_row(size, lambda z, x: '-'*width, '-' * (2*width + 5), ' + ', ' + ', '-')
\ No newline at end of file
+    def __len__(self):
+        length = 1
+        for dim in self.window.size:
+            length *= dim
+        return length
+    
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError('Cell index out of range.')
+        window = self.window
+        return window.grid[window.board_coord(window.from_linear(index % len(self)))]
+
+
+instrument.install('ngrid', globals())
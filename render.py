@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+
+from ngrid import np
+
+
+class Renderer:
+    """ Draws successive frames of an NGrid in a terminal.
+        Each frame is written to the stream in a single call. In incremental
+        mode, only the first frame is drawn in full: later frames use ANSI
+        escape codes to go back and rewrite just the cells whose values
+        changed, so their cost depends on the number of changed cells.
+        This relies on the whole frame staying on screen between draws,
+        with nothing else written in between.
+        """
+
+    def __init__(self, func, width=3, incremental=True, stream=None):
+        """ func and width are as for NGrid.print_nd. """
+
+        self.func = func
+        self.width = width
+        self.incremental = incremental
+        self.stream = sys.stdout if stream is None else stream
+
+        # What was drawn last: the board size, cell values and frame height
+        self.size = None
+        self.values = None
+        self.height = 0
+
+
+    def snapshot(self, grid):
+        """ Copy the values of a board, to compare with the next frame.
+            Boards whose cells are drawn from several packed arrays (such as
+            minesweeper boards) give them through a cell_layers method, and
+            are compared layer by layer. Boards stored in any other way are
+            compared by the text drawn for each cell.
+            """
+
+        if hasattr(grid, 'cell_layers'):
+            return tuple(layer[:] for layer in grid.cell_layers())
+        if isinstance(grid.array, list):
+            return list(grid.array)
+        if np is not None and isinstance(grid.array, np.ndarray):
+            return grid.array.copy()
+        return [self.func(grid[i], self.width) for i in range(len(grid))]
+
+
+    def changed(self, grid, values):
+        """ Get the indices of the cells that differ from the last frame. """
+
+        if isinstance(values, tuple):
+            # A cell has changed if it has changed in any layer
+            if np is not None:
+                changes = np.zeros(len(grid), bool)
+                for new, old in zip(values, self.values):
+                    changes |= np.asarray(memoryview(new)) != np.asarray(memoryview(old))
+                return np.flatnonzero(changes).tolist()
+            changes = set()
+            for new, old in zip(values, self.values):
+                changes.update(i for i, (a, b) in enumerate(zip(new, old)) if a != b)
+            return sorted(changes)
+
+        if np is not None and isinstance(values, np.ndarray):
+            return np.flatnonzero(values != self.values).tolist()
+        return [i for i, (new, old) in enumerate(zip(values, self.values)) if new != old]
+
+
+    def draw(self, grid):
+        """ Draw a frame. """
+
+        values = self.snapshot(grid)
+
+        if not self.incremental or self.size != grid.size:
+            text = grid.render_nd(self.func, self.width)
+            self.height = text.count('\n')
+            self.stream.write(text)
+        else:
+            parts = []
+            for index in self.changed(grid, values):
+                text = self.func(grid[index], self.width)
+                if len(text) != self.width:
+                    # Cells of the wrong width would break the layout
+                    self.size = None
+                    self.draw(grid)
+                    return
+                line, column = grid.cell_position(index, self.width)
+                up = self.height - line
+                parts.append(f'\x1b[{up}A\x1b[{column + 1}G{text}\x1b[{up}B')
+            if parts:
+                parts.append('\r')
+                self.stream.write(''.join(parts))
+
+        self.stream.flush()
+        self.size = grid.size
+        self.values = values
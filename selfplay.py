@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import slide
+from ngrid import np
+
+
+# Policies: (board, rng) -> (dimension, increase)
+# Each is only called when at least one move would change the board.
+
+
+def moves(board):
+    """ All moves that can be made on a board. """
+    return [(dim, increase) for dim in range(len(board.size)) for increase in (False, True)]
+
+
+def try_move(board, move):
+    """ Make a move on a copy of a board.
+        Returns (changed, score, new board).
+        """
+
+    board = board.copy()
+    changed, score = board.move(*move)
+    return changed, score, board
+
+
+def random_policy(board, rng):
+    """ Choose any move that changes the board. """
+
+    options = [move for move in moves(board) if try_move(board, move)[0]]
+    return rng.choice(options)
+
+
+def greedy_policy(board, rng):
+    """ Choose the move scoring the most, then leaving the most empty cells. """
+
+    best = []
+    best_key = None
+    for move in moves(board):
+        changed, score, after = try_move(board, move)
+        if not changed:
+            continue
+        key = (score, len(after.free))
+        if best_key is None or key > best_key:
+            best, best_key = [move], key
+        elif key == best_key:
+            best.append(move)
+    return rng.choice(best)
+
+
+def lookahead_policy(board, rng):
+    """ Choose the move scoring the most over two moves, ignoring the numbers
+        added in between, then leaving the most empty cells.
+        """
+
+    best = []
+    best_key = None
+    for move in moves(board):
+        changed, score, after = try_move(board, move)
+        if not changed:
+            continue
+        key = (score, len(after.free))
+        for second in moves(after):
+            changed2, score2, after2 = try_move(after, second)
+            if changed2:
+                key = max(key, (score + score2, len(after2.free)))
+        if best_key is None or key > best_key:
+            best, best_key = [move], key
+        elif key == best_key:
+            best.append(move)
+    return rng.choice(best)
+
+
+policies = {
+        'random': random_policy,
+        'greedy': greedy_policy,
+        'lookahead': lookahead_policy
+    }
+
+
+def play_game(size, number_gen, policy, seed, max_moves=None):
+    """ Play one game without any input or output.
+        The number generator and policy are given by name, so that games can
+        be sent to other processes. Returns a dict describing the game.
+        """
+
+    rng = random.Random(seed)
+    storage = 'list' if np is None else 'numpy'
+    board = slide.Board(size, slide.number_gens[number_gen], storage, rng.getrandbits(64))
+    choose = policies[policy]
+
+    start = time.perf_counter()
+    moves_made = 0
+    score = 0
+
+    while max_moves is None or moves_made < max_moves:
+        board.add_numbers()
+        if not board.can_move():
+            break
+        score += board.move(*choose(board, rng))[1]
+        moves_made += 1
+
+    return {
+            'seed': seed,
+            'score': score,
+            'moves': moves_made,
+            'max_tile': int(max(board.array)),
+            'time': time.perf_counter() - start
+        }
+
+
+def _play_game(args):
+    return play_game(*args)
+
+
+def run(size, number_gen='Normal', policy='random', games=100, seed=0, processes=None, max_moves=None):
+    """ Play many games across a pool of worker processes, and report on them.
+        Each game gets its own seed derived from the main seed, so the results
+        do not depend on the number of processes.
+        """
+
+    rng = random.Random(seed)
+    tasks = [(tuple(size), number_gen, policy, rng.getrandbits(64), max_moves) for i in range(games)]
+    processes = processes or os.cpu_count()
+
+    start = time.perf_counter()
+    if processes == 1:
+        results = list(map(_play_game, tasks))
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(_play_game, tasks, chunksize=max(1, games // (4 * processes))))
+    elapsed = time.perf_counter() - start
+
+    return report(results, elapsed, size=tuple(size), number_gen=number_gen, policy=policy,
+                  seed=seed, processes=processes)
+
+
+def report(results, elapsed, **settings):
+    """ Summarise a list of games played by play_game. """
+
+    scores = sorted(result['score'] for result in results)
+    total_moves = sum(result['moves'] for result in results)
+
+    summary = dict(settings)
+    summary.update({
+            'games': len(results),
+            'elapsed': elapsed,
+            'games_per_sec': len(results) / elapsed if elapsed else None,
+            'moves_per_sec': total_moves / elapsed if elapsed else None,
+            'moves_mean': total_moves / len(results) if results else None,
+            'score': {
+                    'min': scores[0],
+                    'mean': statistics.fmean(scores),
+                    'median': statistics.median(scores),
+                    'quartiles': statistics.quantiles(scores, n=4) if len(scores) > 1 else scores * 3,
+                    'max': scores[-1]
+                } if scores else None,
+            'max_tiles': dict(sorted(Counter(result['max_tile'] for result in results).items()))
+        })
+    return summary
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Play slide games without a player and report on them.')
+    parser.add_argument('--size', type=int, nargs='+', default=[4, 4], help="the board's dimensions")
+    parser.add_argument('--number-gen', default='Normal', choices=list(slide.number_gens))
+    parser.add_argument('--policy', default='random', choices=list(policies))
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='defaults to the number of cores')
+    parser.add_argument('--max-moves', type=int, default=None)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args(argv)
+
+    summary = run(args.size, args.number_gen, args.policy, args.games, args.seed, args.processes, args.max_moves)
+
+    print(json.dumps(summary, indent=4))
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(summary, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
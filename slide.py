@@ -6,39 +6,149 @@ Created on Mon Mar  9 15:23:00 2020
 @author: mike
 """
 
-from ngrid import NGrid
+from ngrid import NGrid, np
+import instrument
 import random
 import itertools as it
+import copy
+from array import array
 from boundedinput import read_tuple, read_int, read_float, select_one
 
 class Board(NGrid):
+    """ An n-dimensional sliding number board.
+        The empty cells are kept in a pool as they change, so that a random
+        empty cell can be found in constant time: free holds the index of
+        each empty cell, and free_position holds the position of each cell
+        within free, or -1 if it is not empty.
+        """
     
-    def __init__(self, size, number_gen):
+    def __init__(self, size, number_gen, storage='list', seed=None):
+        """ The number generator is called with a random.Random to choose
+            the numbers to add each turn. The same random.Random, seeded with
+            the given seed, is used to choose where they go.
+            """
         
         self.number_gen = number_gen
+        self.random = random.Random(seed)
         
         # Fill in the array with zeros. Numbers will be added later.
-        super().__init__(size, 0)
+        super().__init__(size, 0, storage, int if storage == 'numpy' else None)
+        
+        self.update_free()
+        
+        
+    def __setitem__(self, key, value):
+        """ Keep the pool of empty cells up to date as cells are set. """
+        
+        index = self.cell_index(key)
+        if index is None:
+            super().__setitem__(key, value)
+            self.update_free()
+            return
+        
+        if value == 0:
+            self.mark_empty(index)
+        else:
+            self.mark_filled(index)
+        self.array[index] = value
+        
+        
+    def update_free(self):
+        """ Rebuild the pool of empty cells from scratch. """
+        
+        self.free = array('q', (i for i in range(len(self)) if self.array[i] == 0))
+        self.free_position = array('q', [-1]) * len(self)
+        for position, index in enumerate(self.free):
+            self.free_position[index] = position
+            
+            
+    def mark_empty(self, index):
+        """ Add a cell to the pool of empty cells, if not already there. """
+        
+        if self.free_position[index] == -1:
+            self.free_position[index] = len(self.free)
+            self.free.append(index)
+            
+            
+    def mark_filled(self, index):
+        """ Remove a cell from the pool of empty cells, if there,
+            by moving the last cell in the pool into its place.
+            """
+        
+        position = self.free_position[index]
+        if position != -1:
+            last = self.free.pop()
+            if last != index:
+                self.free[position] = last
+                self.free_position[last] = position
+            self.free_position[index] = -1
         
         
-    # TODO handle lack of space
     def add_numbers(self):
+        """ Add the numbers from the number generator to random empty cells.
+            If the board fills up, any remaining numbers are dropped.
+            Returns the number of numbers added.
+            """
+        
+        numbers = self.number_gen(self.random)
         
-        numbers = self.number_gen()
+        added = 0
+        for number in numbers:
+            if not self.free:
+                break
+            self[self.free[self.random.randrange(len(self.free))]] = number
+            added += 1
+        return added
+    
+    
+    def can_move(self):
+        """ Check if any move would change the board. A board with an empty
+            cell can always change, and a full board can only change if two
+            equal numbers are next to each other.
+            """
         
-        empty_indices = set()
+        if self.free:
+            return True
         
-        for i in range(len(self)):
-            if self[i] == 0:
-                empty_indices.add(i)
+        if np is not None:
+            board = self.to_ndarray()
+            return any((np.diff(board, axis=dim) == 0).any() for dim in range(len(self.size)))
         
-        for number in numbers[:len(empty_indices)]:
-            index = random.choice(list(empty_indices))
-            self[index] = number
-            empty_indices.remove(index)
+        for i, coord in self.coords():
+            for dim in range(len(self.size)):
+                if coord[dim] + 1 < self.size[dim] and self.array[i] == self.array[i + self.strides[dim]]:
+                    return True
+        return False
             
             
+    def copy(self):
+        """ Get an independent copy of the board. """
+        
+        board = copy.copy(self)
+        board.array = self.array.copy()
+        board.free = self.free[:]
+        board.free_position = self.free_position[:]
+        board.random = random.Random()
+        board.random.setstate(self.random.getstate())
+        return board
+        
+        
     def move(self, dimension, increase):
+        """ Slide every number as far as possible along a dimension, merging
+            pairs of equal numbers that meet.
+            Returns whether anything changed and the total of the merged numbers.
+            """
+        
+        if np is None:
+            return self.move_cells(dimension, increase)
+        return self.move_array(dimension, increase)
+        
+        
+    def move_cells(self, dimension, increase):
+        """ Apply a move by walking along each line of the board in turn. """
+        
+        changed = False
+        score = 0
         
         for column in it.product(*map(range, self.size[:dimension]), (0,), *map(range, self.size[dimension+1:])):
             
@@ -65,23 +175,84 @@ class Board(NGrid):
                     combined = self[last] != 0
                     self[last] += self[current]
                     self[current] = 0
+                    changed = True
                     if combined:
+                        score += self[last]
                         last[dimension] += offset
-                
-                
+                        
+        return changed, score
+    
+    
+    def move_array(self, dimension, increase):
+        """ Apply a move to every line of the board at once using numpy.
+            The lines are laid out as the rows of a 2d array, all moving
+            towards the start of the row.
+            """
+        
+        board = self.to_ndarray()
+        lines = np.moveaxis(board, dimension, -1)
+        if increase:
+            lines = lines[..., ::-1]
+        shape = lines.shape
+        lines = lines.reshape(-1, self.size[dimension])
+        
+        lines = _compact(lines)
+        
+        # Within each run of equal numbers, merge the first with the second,
+        # the third with the fourth, and so on
+        same = (lines[:, 1:] == lines[:, :-1]) & (lines[:, :-1] != 0)
+        position = np.arange(same.shape[1])
+        run_starts = np.where(same & ~np.pad(same, ((0, 0), (1, 0)))[:, :-1], position, 0)
+        merge = same & ((position - np.maximum.accumulate(run_starts, axis=1)) % 2 == 0)
+        
+        lines = lines.copy()
+        lines[:, :-1][merge] *= 2
+        lines[:, 1:][merge] = 0
+        score = int(lines[:, :-1][merge].sum())
+        
+        lines = _compact(lines).reshape(shape)
+        if increase:
+            lines = lines[..., ::-1]
+        result = np.moveaxis(lines, -1, dimension)
+        
+        changed = not np.array_equal(result, board)
+        if changed:
+            # Only cells that became empty or filled affect the pool
+            was_empty = (board == 0).reshape(-1, order='F')
+            now_empty = (result == 0).reshape(-1, order='F')
+            for index in np.flatnonzero(was_empty & ~now_empty).tolist():
+                self.mark_filled(index)
+            for index in np.flatnonzero(now_empty & ~was_empty).tolist():
+                self.mark_empty(index)
+            self.set_ndarray(result)
+        return changed, score
+    
+    
     def print_(self):
         
         self.print_nd(lambda t, w: f'{"." if t==0 else t: ^{w}}', 2)
         
         
+def _compact(lines):
+    """ Move the non-zero numbers in each row of a 2d array to the start,
+        keeping their order.
+        """
+    
+    order = np.argsort(lines == 0, axis=1, kind='stable')
+    return np.take_along_axis(lines, order, axis=1)
+
+
+instrument.install('slide', globals())
+
+
 number_gens = {
-        'Easy 2s': lambda: 2,
-        'Normal': lambda: random.choice(((2,), (2,), (4,), (2,2))),
-        'Hard': lambda: random.choice(((2,), (2,), (4,), (2,2), (2,4))),
-        '2-type easy': lambda: random.choice(((2,), (3,))),
-        '2-type normal': lambda: random.choice(((2,), (3,), (4,), (2,3))),
-        '3-type easy': lambda: random.choice(((2,), (3,), (5,))),
-        '4-type easy': lambda: random.choice(((2,), (3,), (5,), (7,)))
+        'Easy 2s': lambda rng: (2,),
+        'Normal': lambda rng: rng.choice(((2,), (2,), (4,), (2,2))),
+        'Hard': lambda rng: rng.choice(((2,), (2,), (4,), (2,2), (2,4))),
+        '2-type easy': lambda rng: rng.choice(((2,), (3,))),
+        '2-type normal': lambda rng: rng.choice(((2,), (3,), (4,), (2,3))),
+        '3-type easy': lambda rng: rng.choice(((2,), (3,), (5,))),
+        '4-type easy': lambda rng: rng.choice(((2,), (3,), (5,), (7,)))
     }
  
 
@@ -98,6 +269,10 @@ def play():
         board.add_numbers()
         board.print_()
         
+        if not board.can_move():
+            print('Game over')
+            break
+        
         move = read_int('Enter a move:\n >>> ', floor=-len(board.size), ceil=len(board.size), repeat=True)
         
         # Pass move
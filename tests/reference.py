@@ -0,0 +1,41 @@
+""" Simple reference implementations for checking the games against. """
+
+import random
+
+import life
+
+
+def soup(size, seed, margin=0):
+    """ Random life cells, a third of them live, leaving margin cells empty
+        at every edge.
+        """
+
+    rng = random.Random(seed)
+    board = life.Board(size, 1, life.conway, False)
+    return [all(margin <= c < dim - margin for c, dim in zip(coord, size)) and rng.random() < 1/3
+            for i, coord in board.coords()]
+
+
+def cells(board):
+    """ The cells of a board as a list of bools. """
+
+    return [bool(value) for value in board.array]
+
+
+def reference_step(board, state):
+    """ The next generation of a state, counting neighbours with get_neighbours. """
+
+    result = []
+    for i, coord in board.coords():
+        count = sum(state[board.to_linear(neighbour)] for neighbour in board.get_neighbours(coord))
+        result.append(bool(board.rules(board.size, board.adjacency, count, state[i])))
+    return result
+
+
+def reference_run(size, adjacency, rules, state, generations, boundary='clip'):
+    """ Run a state for a number of generations with reference_step. """
+
+    board = life.Board(size, adjacency, rules, False, boundary=boundary)
+    for generation in range(generations):
+        state = reference_step(board, state)
+    return state
@@ -0,0 +1,31 @@
+""" Check neighbours on clipped, wrapped and mixed boundaries. """
+
+import pytest
+
+from adjgrid import AdjGrid
+
+
+@pytest.mark.parametrize('boundary', ['clip', 'wrap', ('wrap', 'clip', 'clip')])
+@pytest.mark.parametrize('adjacency', [1, 2, 3])
+def test_neighbours(adjacency, boundary):
+    grid = AdjGrid((5, 4, 3), adjacency, 0, boundary=boundary)
+    modes = boundary if isinstance(boundary, tuple) else (boundary,) * 3
+    wrap = [mode == 'wrap' for mode in modes]
+
+    starts, indices = grid.get_neighbour_table()
+    for i, coord in grid.coords():
+        expected = []
+        for offset in grid.offsets:
+            neighbour = [c + o for c, o in zip(coord, offset)]
+            if all(w or 0 <= n < dim for n, dim, w in zip(neighbour, grid.size, wrap)):
+                expected.append([n % dim for n, dim in zip(neighbour, grid.size)])
+
+        assert grid.get_neighbours(coord) == expected
+        assert list(indices[starts[i]:starts[i+1]]) == [grid.to_linear(n) for n in expected]
+
+
+def test_bad_boundary():
+    with pytest.raises(ValueError):
+        AdjGrid((3, 3), 2, 0, boundary='bounce')
+    with pytest.raises(ValueError):
+        AdjGrid((3, 3), 2, 0, boundary=('wrap',))
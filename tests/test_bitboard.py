@@ -0,0 +1,33 @@
+""" Check bit-parallel layers against counts made cell by cell. """
+
+import random
+
+import pytest
+
+from adjgrid import AdjGrid
+from bitboard import Bitboard
+
+
+@pytest.mark.parametrize('boundary', ['clip', 'wrap', ('clip', 'wrap', 'clip')])
+@pytest.mark.parametrize('adjacency', [1, 2, 3])
+def test_neighbour_counts(adjacency, boundary):
+    grid = AdjGrid((6, 5, 4), adjacency, 0, boundary=boundary)
+    rng = random.Random(f'{adjacency}:{boundary}')
+    values = [rng.random() < 0.4 for i in range(len(grid))]
+
+    bitboard = Bitboard(grid.size, grid.wrap)
+    layer = bitboard.pack(values)
+    assert list(bitboard.unpack(layer)) == [int(value) for value in values]
+
+    counts = bitboard.counts(bitboard.neighbour_counts(layer, adjacency))
+    assert list(counts) == [sum(values[grid.to_linear(n)] for n in grid.get_neighbours(coord))
+                            for i, coord in grid.coords()]
+
+
+def test_wide_counts():
+    # 4-D full adjacency has 80 neighbours, and 6-D 728, which needs 16 bits
+    for size, typecode in (((3, 3, 3, 3), 'B'), ((3,) * 6, 'H')):
+        bitboard = Bitboard(size, (True,) * len(size))
+        counts = bitboard.counts(bitboard.neighbour_counts(bitboard.full, len(size)), typecode)
+        assert set(counts) == {3**len(size) - 1}
+
@@ -0,0 +1,115 @@
+""" Check saving and loading boards. """
+
+import io
+
+import pytest
+
+import boardio
+import life
+import msnd
+import slide
+from ngrid import NGrid, np
+from reference import cells, soup
+
+
+needs_numpy = pytest.mark.skipif(np is None, reason='needs numpy')
+
+
+def round_trip(board, compress=False, **kwargs):
+    file = io.BytesIO()
+    boardio.save(board, file, compress)
+    file.seek(0)
+    return boardio.load(file, **kwargs)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+@pytest.mark.parametrize('values', [
+        [True, False] * 30,
+        list(range(60)),
+        [i * 1000 for i in range(60)],
+        [i - 30 for i in range(60)],
+        [2**63 + i for i in range(60)],
+        [i / 4 for i in range(60)]
+    ])
+def test_grid(values, compress):
+    grid = NGrid((5, 4, 3), values)
+    loaded = round_trip(grid, compress)
+    assert loaded.size == grid.size
+    assert list(loaded.array) == values
+    assert [type(value) for value in loaded.array] == [type(value) for value in values]
+
+
+@needs_numpy
+def test_grid_numpy():
+    for dtype in (bool, np.uint16, np.int64, np.float32, np.float64):
+        grid = NGrid((6, 5), np.arange(30) % 7 - 2, 'numpy', dtype)
+        loaded = round_trip(grid, True)
+        assert loaded.storage == 'numpy'
+        # Integers of any width load as int64, other types keep their kind
+        assert loaded.array.dtype.kind.replace('u', 'i') == np.dtype(dtype).kind.replace('u', 'i')
+        assert (loaded.array == grid.array).all()
+
+
+@pytest.mark.parametrize('values', [[None] * 4, [1, 'a', 2, 3], [-1, 2**63, 0, 0], [2**64, 0, 0, 0]])
+def test_unsaveable(values):
+    with pytest.raises(ValueError):
+        boardio.save(NGrid((2, 2), values), io.BytesIO())
+
+
+@pytest.mark.parametrize('rules', ['conway', 'highlife', 'B36/S125'])
+def test_life(rules):
+    board = life.Board((9, 8), 2, rules, soup((9, 8), rules), boundary=('wrap', 'clip'), engine='bitboard')
+    loaded = round_trip(board, True)
+    assert cells(loaded) == cells(board)
+    assert loaded.wrap == board.wrap
+    assert loaded.engine == board.engine
+    assert loaded.get_rule_table() == board.get_rule_table()
+
+    board.update()
+    loaded.update()
+    assert cells(loaded) == cells(board)
+
+
+@needs_numpy
+def test_mmap(tmp_path):
+    board = life.Board((20, 10, 6), 3, '3d 4555', soup((20, 10, 6), 'mmap'), 'numpy', 'slabs')
+    path = str(tmp_path / 'board.ndgb')
+    boardio.save(board, path, compress=True)
+
+    loaded = boardio.load(path, storage='mmap', path=str(tmp_path / 'cells'))
+    assert loaded.storage == 'mmap'
+    assert isinstance(loaded.array, np.memmap)
+    assert cells(loaded) == cells(board)
+
+    board.update()
+    loaded.update()
+    assert cells(loaded) == cells(board)
+
+
+def test_msnd():
+    board = msnd.Board((7, 6, 3), 3, 0.2, 'wrap', seed=1)
+    board.first_move((3, 3, 1))
+    loaded = round_trip(board, True)
+    assert loaded.is_mine == board.is_mine
+    assert loaded.visibility == board.visibility
+    assert list(loaded.mines) == list(board.mines)
+    assert (loaded.safe, loaded.revealed) == (board.safe, board.revealed)
+
+
+def test_slide():
+    board = slide.Board((4, 4), slide.number_gens['Normal'], seed=2)
+    for turn in range(5):
+        board.add_numbers()
+    loaded = round_trip(board)
+    assert list(loaded.array) == list(board.array)
+    assert sorted(loaded.free) == sorted(board.free)
+
+
+def test_bad_files():
+    with pytest.raises(ValueError):
+        boardio.load(io.BytesIO(b'nope'))
+
+    file = io.BytesIO()
+    boardio.save(NGrid((10, 10), 3), file)
+    with pytest.raises(ValueError):
+        boardio.load(io.BytesIO(file.getvalue()[:-5]))
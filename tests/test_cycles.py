@@ -0,0 +1,116 @@
+""" Check state hashing, cycle detection and fast-forwarding life runs. """
+
+import tracemalloc
+
+import pytest
+
+import life
+from ngrid import np
+from reference import cells, soup
+
+
+engines = ['cells', 'incremental', 'bitboard', pytest.param('vectorized', marks=pytest.mark.skipif(np is None, reason='needs numpy'))]
+
+
+def plain_run(size, state, generations, boundary='wrap'):
+    """ The states of every generation, run one at a time. """
+
+    board = life.Board(size, 2, life.conway, list(state), boundary=boundary)
+    states = [cells(board)]
+    for generation in range(generations):
+        board.update()
+        states.append(cells(board))
+    return states
+
+
+@pytest.mark.parametrize('engine', engines)
+def test_hash(engine):
+    board = life.Board((10, 9), 2, life.conway, soup((10, 9), 'hash'), engine=engine, boundary='wrap')
+    board.get_hash()
+    for generation in range(10):
+        board.update()
+        assert board.hash == board.state_hash()
+
+    # Setting a cell by hand keeps the hash too
+    board[(3, 3)] = not board[(3, 3)]
+    assert board.get_hash() == board.state_hash()
+
+
+def test_no_cycle():
+    board = life.Board((10, 10), 2, life.conway, False)
+    board[(5, 5)] = True
+    board.get_hash()
+    assert board.find_cycle() is None
+
+
+@pytest.mark.parametrize('engine', engines)
+def test_blinker(engine):
+    board = life.Board((7, 7), 2, life.conway, False, engine=engine)
+    for coord in [(2, 3), (3, 3), (4, 3)]:
+        board[coord] = True
+    start = cells(board)
+
+    assert board.run(1001) == (2, 0)
+    assert board.generation == 1001
+    assert cells(board) == plain_run((7, 7), start, 1, 'clip')[1]
+
+
+def test_glider():
+    # A glider on a wrapped 8x8 board comes back to where it started every 32 generations
+    board = life.Board((8, 8), 2, life.conway, False, boundary='wrap')
+    for coord in [(1, 2), (2, 3), (3, 1), (3, 2), (3, 3)]:
+        board[coord] = True
+    start = cells(board)
+
+    assert board.run(10**6 + 5) == (32, 0)
+    assert cells(board) == plain_run((8, 8), start, 5)[5]
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_transient(seed):
+    # These settle into blinkers and still lifes after 27 to 425 generations
+    size = (16, 16)
+    state = soup(size, f'transient:{seed}')
+    generations = 1000
+    states = plain_run(size, state, generations)
+
+    board = life.Board(size, 2, life.conway, list(state), boundary='wrap')
+    period, transient = board.run(generations)
+    assert cells(board) == states[generations]
+    assert board.generation == generations
+
+    # The cycle is entered at the transient, and not before
+    assert period in (1, 2)
+    assert states[transient] == states[transient + period]
+    assert states[transient - 1] != states[transient - 1 + period]
+
+
+@pytest.mark.skipif(np is None, reason='needs numpy')
+def test_mmap_run(tmp_path, monkeypatch):
+    # Hashing and checking cycles work a slab at a time, so a board mapped
+    # from disk is never held in memory whole
+    monkeypatch.setattr(life, 'SLAB_CELLS', 2**12)
+    size = (40, 40, 400)
+    state = np.zeros(size, bool)
+    state[15:25, 15:25, 195:205] = np.random.default_rng(0).random((10, 10, 10)) < 0.3
+    state = state.reshape(-1, order='F')
+
+    board = life.Board(size, 3, '3d 4555', state, 'mmap', 'slabs', path=str(tmp_path / 'cells'))
+    board.get_hash()
+    board.update()
+
+    tracemalloc.start()
+    try:
+        board.update()
+        assert board.hash == board.state_hash()
+        cycle = board.run(1001)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < len(board) // 4
+
+    expected = life.Board(size, 3, '3d 4555', state, 'numpy', 'slabs')
+    assert expected.run(1003) == cycle
+    assert cycle[0] is not None
+    assert board.generation == 1003
+    assert (board.array == expected.array).all()
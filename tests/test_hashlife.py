@@ -0,0 +1,102 @@
+""" Check HashLife against the reference life step. """
+
+import random
+
+import pytest
+
+import hashlife
+import life
+from reference import cells, reference_run, soup
+
+
+def test_advance():
+    # A glider and a blinker in the middle of a board, well clear of its edges
+    size = (24, 24)
+    board = life.Board(size, 2, life.conway, False)
+    for coord in [(4, 5), (5, 6), (6, 4), (6, 5), (6, 6), (16, 16), (16, 17), (16, 18)]:
+        board[coord] = True
+    state = cells(board)
+
+    hashlife.advance(board, 13)
+    assert cells(board) == reference_run(size, 2, life.conway, state, 13)
+    assert board.generation == 13
+
+
+def test_advance_3d():
+    size = (10, 10, 10)
+    state = soup(size, 'hashlife', margin=4)
+    board = life.Board(size, 3, life.configs['3d 5766'], list(state))
+
+    hashlife.advance(board, 2)
+    assert cells(board) == reference_run(size, 3, life.configs['3d 5766'], state, 2)
+
+
+def test_glider_leaving():
+    # A glider flying off a small board must not be silently dropped
+    board = life.Board((8, 8), 2, life.conway, False)
+    for coord in [(1, 2), (2, 3), (3, 1), (3, 2), (3, 3)]:
+        board[coord] = True
+    state = cells(board)
+
+    with pytest.raises(ValueError):
+        hashlife.advance(board, 200)
+    assert cells(board) == state
+
+
+def test_node_cap():
+    rng = random.Random(1)
+    live = [(x, y) for x in range(24) for y in range(24) if rng.random() < 0.35]
+    board = life.Board((8, 8), 2, life.conway, False)
+
+    universes = []
+    for max_nodes in (2**20, 4000):
+        universe = hashlife.HashLife(2, board.offsets, board.get_rule_table(), max_nodes)
+        universe.set_cells(live)
+        universe.advance(100)
+        assert len(universe.nodes) <= max_nodes
+        universes.append(sorted(universe.get_cells()))
+    assert universes[0] == universes[1]
+
+    universe = hashlife.HashLife(2, board.offsets, board.get_rule_table(), 200)
+    universe.set_cells(live)
+    with pytest.raises(MemoryError):
+        universe.advance(100)
+
+
+def middle_soup(seed):
+    """ A random 10x10 soup in the middle of a 16x16 board. """
+
+    rng = random.Random(seed)
+    return [3 <= x < 13 and 3 <= y < 13 and rng.random() < 0.35 for y in range(16) for x in range(16)]
+
+
+def test_leaving_mid_step():
+    # Cells are born beyond the edges of the board part way through the
+    # 32 generations after the 8th, and are all back on it by the end, yet
+    # the clipped board ends up different
+    state = middle_soup(23)
+    board = life.Board((16, 16), 2, life.conway, list(state))
+    universe = hashlife.HashLife.from_board(board)
+    universe.advance(40)
+    assert universe.room(board) >= 1
+
+    with pytest.raises(ValueError):
+        hashlife.advance(board, 40)
+    assert cells(board) == state
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_clipped_soups(seed):
+    # Either the result is exactly what the board's own engine gives, or a
+    # ValueError says that the pattern spread off the board
+    generations = 8 + seed
+    board = life.Board((16, 16), 2, life.conway, middle_soup(seed))
+    expected = life.Board((16, 16), 2, life.conway, middle_soup(seed))
+    for generation in range(generations):
+        expected.update()
+
+    try:
+        hashlife.advance(board, generations)
+    except ValueError:
+        return
+    assert cells(board) == cells(expected)
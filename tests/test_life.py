@@ -0,0 +1,99 @@
+""" Check the Game of Life engines against a reference step built on
+    get_neighbours.
+    """
+
+import pytest
+
+import life
+from ngrid import np
+from reference import cells, reference_run, soup
+
+
+needs_numpy = pytest.mark.skipif(np is None, reason='needs numpy')
+
+# (size, adjacency, rules)
+cases = [
+        ((9, 7), 2, life.conway),
+        ((9, 7), 1, life.configs['highlife']),
+        ((6, 5, 4), 3, life.configs['3d 4555']),
+        ((6, 5, 4), 2, life.configs['day and night']),
+        ((4, 3, 3, 5), 2, life.configs['seeds'])
+    ]
+
+# Mixed boundaries wrap the first dimension only
+boundaries = ['clip', 'wrap', 'mixed']
+
+engines = [
+        pytest.param('cells'),
+        pytest.param('vectorized', marks=needs_numpy),
+        pytest.param('slabs', marks=needs_numpy),
+        pytest.param('bitboard'),
+        pytest.param('incremental')
+    ]
+
+storages = ['list', pytest.param('numpy', marks=needs_numpy)]
+
+
+@pytest.mark.parametrize('engine', engines)
+@pytest.mark.parametrize('storage', storages)
+@pytest.mark.parametrize('boundary', boundaries)
+@pytest.mark.parametrize('size, adjacency, rules', cases)
+def test_engine(size, adjacency, rules, boundary, storage, engine):
+    if boundary == 'mixed':
+        boundary = ('wrap',) + ('clip',) * (len(size) - 1)
+    state = soup(size, f'{size}:{adjacency}')
+    board = life.Board(size, adjacency, rules, list(state), storage, engine, boundary)
+
+    for generation in range(4):
+        state = reference_run(size, adjacency, rules, state, 1, boundary)
+        board.update()
+        assert cells(board) == state
+
+
+def test_incremental_edits():
+    # Cells set between generations must be picked up by the active frontier
+    size = (9, 7)
+    state = soup(size, 'edits')
+    board = life.Board(size, 2, life.conway, list(state), engine='incremental')
+
+    for generation in range(4):
+        board.update()
+        state = reference_run(size, 2, life.conway, state, 1)
+        board[(generation, 3)] = True
+        state[board.to_linear((generation, 3))] = True
+    board.update()
+    assert cells(board) == reference_run(size, 2, life.conway, state, 1)
+
+
+@needs_numpy
+@pytest.mark.parametrize('boundary', ['clip', 'wrap'])
+def test_mmap_slabs(tmp_path, monkeypatch, boundary):
+    # Small slabs, so that every generation is streamed in several parts
+    monkeypatch.setattr(life, 'SLAB_CELLS', 100)
+    size = (8, 6, 9)
+    state = soup(size, 'mmap')
+    path = str(tmp_path / 'cells')
+    board = life.Board(size, 3, '3d 4555', list(state), 'mmap', 'slabs', boundary, path)
+
+    for generation in range(3):
+        state = reference_run(size, 3, life.configs['3d 4555'], state, 1, boundary)
+        board.update()
+        assert cells(board) == state
+
+    # The board's path always names the file holding the current generation
+    board.flush()
+    assert board.path in (path, path + '.next')
+    assert np.fromfile(board.path, board.array.dtype).astype(bool).tolist() == state
+
+
+@pytest.mark.parametrize('engine', ['cells', 'incremental'])
+def test_bad_keys(engine):
+    # Checked the same whether or not the counts and the hash are being kept
+    board = life.Board((5, 4), 2, life.conway, False, engine=engine)
+    board.update()
+    board.get_hash()
+    for key in ((1,), (1, 2, 3), 20, -21):
+        with pytest.raises(IndexError):
+            board[key] = True
+    assert not any(board.array)
+    assert board.get_hash() == board.state_hash()
@@ -0,0 +1,59 @@
+""" Check the multi-process life engine against the reference life step. """
+
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+
+import life
+import lifeparallel
+from ngrid import np
+from reference import cells, reference_run, soup
+
+
+pytestmark = pytest.mark.skipif(np is None, reason='needs numpy')
+
+
+@pytest.mark.parametrize('boundary', ['clip', 'wrap'])
+@pytest.mark.parametrize('size, adjacency, rules', [
+        ((9, 7), 2, life.conway),
+        ((9, 7), 1, life.configs['highlife']),
+        ((6, 5, 4), 3, life.configs['3d 4555'])
+    ])
+def test_advance(size, adjacency, rules, boundary):
+    state = soup(size, str(size), margin=1)
+    board = life.Board(size, adjacency, rules, list(state), 'numpy', 'slabs', boundary)
+
+    lifeparallel.advance(board, 3, processes=2, timeout=60)
+    assert cells(board) == reference_run(size, adjacency, rules, state, 3, boundary)
+    assert board.generation == 3
+
+
+def shared_memory_exists(buffers):
+    return [os.path.exists(f'/dev/shm/{buffer.name}') for buffer in buffers]
+
+
+@pytest.mark.skipif(not os.path.isdir('/dev/shm'), reason='needs /dev/shm')
+def test_worker_killed():
+    board = life.Board((12, 10, 6), 3, '3d 4555', soup((12, 10, 6), 'killed'), 'numpy', 'slabs')
+    parallel = lifeparallel.ParallelLife(board, 2)
+    buffers = parallel.buffers
+    os.kill(parallel.workers[1].pid, signal.SIGKILL)
+
+    with pytest.raises(RuntimeError):
+        parallel.advance(5)
+    assert parallel.workers is None
+    assert not any(shared_memory_exists(buffers))
+    parallel.close()
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='needs forked workers')
+def test_timeout(monkeypatch):
+    # Workers forked after this never finish a generation in time
+    monkeypatch.setattr(life, '_step_slabs', lambda *args: time.sleep(5))
+    board = life.Board((12, 10, 6), 3, '3d 4555', soup((12, 10, 6), 'timeout'), 'numpy', 'slabs')
+
+    with pytest.raises(RuntimeError):
+        lifeparallel.advance(board, 2, processes=2, timeout=0.3)
@@ -0,0 +1,125 @@
+""" Check the minesweeper board against neighbours found with get_neighbours. """
+
+import pytest
+
+import msnd
+
+
+def reference_counts(board):
+    """ The number of mines next to each tile. """
+
+    return [sum(board.is_mine[board.to_linear(neighbour)] for neighbour in board.get_neighbours(coord))
+            for i, coord in board.coords()]
+
+
+@pytest.mark.parametrize('boundary', ['clip', 'wrap'])
+@pytest.mark.parametrize('size, adjacency', [((7, 6), 2), ((5, 4, 3), 2), ((4, 3, 3, 4), 4)])
+def test_counts(size, adjacency, boundary):
+    board = msnd.Board(size, adjacency, 0.3, boundary, seed=1)
+    assert list(board.mines) == reference_counts(board)
+    assert isinstance(board.is_mine, bytearray) and isinstance(board.visibility, bytearray)
+
+
+def test_tiles():
+    board = msnd.Board((6, 5), 2, 0.3, seed=2)
+    for i, coord in board.coords():
+        tile = board[coord]
+        assert tile.is_mine == board.is_mine[i]
+        assert tile.mines == board.mines[i]
+        assert sorted(t.index for t in tile.neighbours) == sorted(
+                board.to_linear(neighbour) for neighbour in board.get_neighbours(coord))
+
+    tile = board[(2, 2)]
+    tile.visibility = 2
+    assert board.visibility[board.to_linear((2, 2))] == 2
+    assert board.neighbour_table is None
+
+
+def reference_reveal(board, start):
+    """ The tiles revealed by clicking a tile, spreading from tiles with no
+        adjacent mines.
+        """
+
+    revealed = {start}
+    stack = [start]
+    while stack:
+        i = stack.pop()
+        if board.mines[i] == 0:
+            for neighbour in board.get_neighbours(board.from_linear(i)):
+                index = board.to_linear(neighbour)
+                if index not in revealed:
+                    revealed.add(index)
+                    stack.append(index)
+    return revealed
+
+
+@pytest.mark.parametrize('size, adjacency', [((12, 10), 2), ((6, 5, 4), 3)])
+def test_move(size, adjacency):
+    board = msnd.Board(size, adjacency, 0.1, seed=3)
+    start = next(i for i in range(len(board)) if not board.is_mine[i] and board.mines[i] == 0)
+    expected = reference_reveal(board, start)
+
+    board.move(board.from_linear(start))
+    assert {i for i in range(len(board)) if board.visibility[i] == 1} == expected
+    assert board.revealed == len(expected)
+
+
+def test_is_won():
+    board = msnd.Board((6, 6), 2, 0.2, seed=4)
+    assert board.safe == len(board) - board.is_mine.count(1)
+
+    safe = [i for i in range(len(board)) if not board.is_mine[i]]
+    for i in safe[:-1]:
+        board.set_visibility(i, 1)
+        assert not board.is_won()
+    board.set_visibility(safe[-1], 1)
+    assert board.is_won()
+
+    # Flagging or hiding a revealed tile again is counted too
+    board.set_visibility(safe[0], 2)
+    assert not board.is_won()
+
+
+@pytest.mark.parametrize('boundary', ['clip', 'wrap'])
+@pytest.mark.parametrize('coord', [(0, 0), (3, 4), (7, 2)])
+def test_first_move(coord, boundary):
+    board = msnd.Board((8, 6), 2, 0.4, boundary, seed=5)
+    mines = board.is_mine.count(1)
+
+    board.first_move(coord)
+    index = board.to_linear(coord)
+    cleared = [index] + [board.to_linear(neighbour) for neighbour in board.get_neighbours(coord)]
+
+    assert board.is_mine.count(1) == mines
+    assert not any(board.is_mine[i] for i in cleared)
+    assert board.mines[index] == 0
+    assert list(board.mines) == reference_counts(board)
+    assert board.visibility[index] == 1
+    assert board.neighbour_table is None
+
+
+def test_place_mines():
+    is_mine = msnd.place_mines(1000, 137, seed=6)
+    assert len(is_mine) == 1000 and is_mine.count(1) == 137
+    assert msnd.place_mines(1000, 137, seed=6) == is_mine
+    assert msnd.place_mines(1000, 137, seed=7) != is_mine
+    assert msnd.place_mines(10, 10, seed=6) == bytearray([1] * 10)
+
+
+def test_seeded_boards():
+    boards = [msnd.Board((9, 8), 2, 0.25, seed=8) for i in range(2)]
+    assert boards[0].is_mine == boards[1].is_mine
+    assert boards[0].is_mine.count(1) == round(0.25 * 72)
+
+    # The mines moved by the first move come from the board's own seed too
+    for board in boards:
+        board.first_move((4, 4))
+    assert boards[0].is_mine == boards[1].is_mine
+
+
+@pytest.mark.skipif(msnd.np is None, reason='needs numpy')
+def test_chunks():
+    is_mine = msnd.place_mines(10000, 1234, seed=9, chunks=4)
+    assert is_mine.count(1) == 1234
+    assert msnd.place_mines(10000, 1234, seed=9, chunks=4, processes=2) == is_mine
+    assert msnd.place_mines(10000, 1234, seed=msnd.np.random.default_rng(9), chunks=4).count(1) == 1234
@@ -0,0 +1,119 @@
+""" Check the terminal renderer by playing its output back onto a screen. """
+
+import io
+import re
+
+import pytest
+
+import msnd
+from ngrid import NGrid
+from render import Renderer
+
+
+def cell_text(value, width):
+    return f'{value: ^{width}}'
+
+
+def play(screen, text):
+    """ Apply text written to a terminal to a screen, as a list of lines,
+        starting with the cursor on the line below the last line drawn.
+        """
+
+    line, column = len(screen), 0
+    for match in re.finditer(r'\x1b\[(\d+)([ABG])|\r|\n|[^\x1b\r\n]+', text):
+        part = match.group(0)
+        if match.group(2) == 'A':
+            line -= int(match.group(1))
+        elif match.group(2) == 'B':
+            line += int(match.group(1))
+        elif match.group(2) == 'G':
+            column = int(match.group(1)) - 1
+        elif part == '\r':
+            column = 0
+        elif part == '\n':
+            line, column = line + 1, 0
+        else:
+            while len(screen) <= line:
+                screen.append('')
+            row = screen[line].ljust(column)
+            screen[line] = row[:column] + part + row[column + len(part):]
+            column += len(part)
+
+
+@pytest.mark.parametrize('size', [(4,), (3, 4), (3, 2, 2), (2, 3, 2, 2), (2, 2, 1, 2, 3)])
+def test_cell_position(size):
+    grid = NGrid(size, list(range(len(NGrid(size, 0)))))
+    lines = grid.render_nd(cell_text, 3).split('\n')
+    for i in range(len(grid)):
+        line, column = grid.cell_position(i, 3)
+        assert lines[line][column:column + 3] == cell_text(i, 3)
+
+
+@pytest.mark.parametrize('size', [(5, 4), (3, 2, 2, 2)])
+def test_incremental(size):
+    grid = NGrid(size, 0)
+    stream = io.StringIO()
+    renderer = Renderer(cell_text, 3, stream=stream)
+
+    renderer.draw(grid)
+    first = stream.getvalue()
+    assert first == grid.render_nd(cell_text, 3)
+    screen = first.split('\n')[:-1]
+
+    for frame in range(1, 4):
+        for i in range(frame, len(grid), 3):
+            grid[i] = frame
+        stream.seek(0)
+        stream.truncate()
+        renderer.draw(grid)
+        assert len(stream.getvalue()) < len(first)
+        play(screen, stream.getvalue())
+        assert screen == grid.render_nd(cell_text, 3).split('\n')[:-1]
+
+    # A frame with no changes writes nothing
+    stream.seek(0)
+    stream.truncate()
+    renderer.draw(grid)
+    assert stream.getvalue() == ''
+
+
+def test_full_frames():
+    grid = NGrid((3, 3), 0)
+    stream = io.StringIO()
+    renderer = Renderer(cell_text, 3, incremental=False, stream=stream)
+
+    renderer.draw(grid)
+    before = grid.render_nd(cell_text, 3)
+    grid[4] = 1
+    renderer.draw(grid)
+    assert stream.getvalue() == before + grid.render_nd(cell_text, 3)
+
+
+def test_minesweeper():
+    board = msnd.Board((8, 6, 2), 3, 0.15, seed=1)
+    calls = []
+
+    def tile_text(tile, width):
+        calls.append(tile.index)
+        return tile.__str__(width)
+
+    stream = io.StringIO()
+    renderer = Renderer(tile_text, 3, stream=stream)
+    renderer.draw(board)
+    screen = stream.getvalue().split('\n')[:-1]
+
+    # Only the tiles changed by a move are drawn again: those revealed, and
+    # any whose mine or count changed as mines were moved away
+    before = [layer[:] for layer in board.cell_layers()]
+    board.first_move((4, 3, 1))
+    changed = [i for i in range(len(board))
+               if any(new[i] != old[i] for new, old in zip(board.cell_layers(), before))]
+    assert 0 < len(changed) < len(board)
+
+    calls.clear()
+    stream.seek(0)
+    stream.truncate()
+    renderer.draw(board)
+    assert sorted(calls) == changed
+    play(screen, stream.getvalue())
+    assert screen == board.render_nd(tile_text, 3).split('\n')[:-1]
@@ -0,0 +1,44 @@
+""" Check rulestrings and compiled rule tables. """
+
+import pytest
+
+import life
+
+
+@pytest.mark.parametrize('rulestring, born, survive', [
+        ('B3/S23', {3}, {2, 3}),
+        ('s23/b36', {3, 6}, {2, 3}),
+        (' B2/S ', {2}, set()),
+        ('B/S012345678', set(), set(range(9))),
+        ('B5,10-12/S4-6', {5, 10, 11, 12}, {4, 5, 6})
+    ])
+def test_parse(rulestring, born, survive):
+    rule = life.Rule.parse(rulestring)
+    assert rule.born == born and rule.survive == survive
+    assert life.Rule.parse(str(rule)).born == born
+    assert life.Rule.parse(str(rule)).survive == survive
+
+
+@pytest.mark.parametrize('rulestring', [
+        '', 'B3', 'S23', 'B3/S23/B3', 'B3/B3', 'X3/S23', 'B3a/S23', 'B3-/S2', 'B1-2-3/S2', 'B,3/S2', '23/3'
+    ])
+def test_malformed(rulestring):
+    with pytest.raises(ValueError):
+        life.Rule.parse(rulestring)
+
+
+def test_rule_table():
+    board = life.Board((5, 5), 2, 'B36/S23')
+    born, survive = board.get_rule_table()
+    assert len(born) == len(survive) == 9
+    assert [n for n in range(9) if born[n]] == [3, 6]
+    assert [n for n in range(9) if survive[n]] == [2, 3]
+
+    # A life function compiles to the same table as its rulestring
+    assert life.Board((5, 5), 2, life.conway).get_rule_table() == life.Board((5, 5), 2, 'B3/S23').get_rule_table()
+    assert life.Board((5, 5), 2, 'conway').rules is life.conway
+
+
+def test_unknown_rules():
+    with pytest.raises(ValueError):
+        life.Board((5, 5), 2, 'not a rule')
@@ -0,0 +1,86 @@
+""" Check the slide board's moves and its pool of empty cells. """
+
+import random
+
+import pytest
+
+import slide
+from ngrid import np
+
+
+def random_board(size, seed, storage='list'):
+    rng = random.Random(seed)
+    board = slide.Board(size, slide.number_gens['Normal'], storage, seed)
+    for i in range(len(board)):
+        if rng.random() < 0.6:
+            board[i] = rng.choice((2, 2, 4, 4, 8))
+    return board
+
+
+@pytest.mark.skipif(np is None, reason='needs numpy')
+@pytest.mark.parametrize('size', [(4, 4), (5, 3, 4), (3, 2, 3, 2)])
+def test_moves(size):
+    for trial in range(20):
+        board = random_board(size, f'{size}:{trial}', 'numpy')
+
+        for dimension in range(len(size)):
+            for increase in (False, True):
+                by_cells = board.copy()
+                by_array = board.copy()
+                assert by_cells.move_cells(dimension, increase) == by_array.move_array(dimension, increase)
+                assert list(by_cells.array) == list(by_array.array)
+
+
+def test_merge():
+    board = slide.Board((4, 1), slide.number_gens['Normal'])
+    for i, value in enumerate((2, 2, 4, 4)):
+        board[i] = value
+
+    assert board.move_cells(0, False) == (True, 12)
+    assert list(board.array) == [4, 8, 0, 0]
+    assert board.move_cells(0, False) == (False, 0)
+
+
+def check_free(board):
+    """ Check that the pool of empty cells holds exactly the empty cells. """
+
+    assert sorted(board.free) == [i for i in range(len(board)) if board.array[i] == 0]
+    for position, index in enumerate(board.free):
+        assert board.free_position[index] == position
+
+
+@pytest.mark.parametrize('storage', ['list', pytest.param('numpy', marks=pytest.mark.skipif(np is None, reason='needs numpy'))])
+def test_free(storage):
+    board = random_board((5, 4, 3), 'free', storage)
+    check_free(board)
+
+    rng = random.Random(0)
+    for turn in range(50):
+        board.move(rng.randrange(3), rng.random() < 0.5)
+        check_free(board)
+        before = len(board.free)
+        added = board.add_numbers()
+        assert added == before - len(board.free)
+        check_free(board)
+
+
+def test_full_board():
+    board = slide.Board((2, 2), slide.number_gens['Normal'], seed=1)
+    for i in range(len(board)):
+        board[i] = 2 * (i + 1)
+    assert not board.free
+    assert board.add_numbers() == 0
+
+
+def test_bad_keys():
+    board = slide.Board((4, 4), slide.number_gens['Normal'])
+    for key in ((1,), (1, 2, 3), 16, -17):
+        with pytest.raises(IndexError):
+            board[key] = 2
+    assert not any(board.array)
+    check_free(board)
+
+    board[-1] = 4
+    board[(1, 2)] = 8
+    assert board[(3, 3)] == 4 and board[9] == 8
+    check_free(board)
@@ -0,0 +1,67 @@
+""" Check windows onto boards and block summaries. """
+
+import pytest
+
+from ngrid import NGrid, np
+
+
+class CountingCells(list):
+    """ A list of cells counting how many of them are read. """
+
+    reads = 0
+
+    def __getitem__(self, index):
+        CountingCells.reads += 1
+        return super().__getitem__(index)
+
+
+def test_window():
+    grid = NGrid((6, 5, 4), list(range(120)))
+    window = grid.window([(1, 4), 2, slice(None, None, 2)])
+    assert window.size == (3, 2)
+
+    for i, (x, z) in window.coords():
+        assert window[(x, z)] == grid[(1 + x, 2, 2 * z)]
+        assert window[i] == window[(x, z)]
+
+    window[(2, 1)] = -1
+    assert grid[(3, 2, 2)] == -1
+    window[0] = -2
+    assert grid[(1, 2, 0)] == -2
+
+
+def test_window_reads():
+    grid = NGrid((50, 50, 50), CountingCells(range(50**3)))
+    window = grid.window([(10, 13), None, 7])
+    CountingCells.reads = 0
+    window.render_nd(lambda value, width: f'{value % 100: >{width}}', 2)
+    assert CountingCells.reads == len(window) == 150
+
+
+def test_bad_window():
+    grid = NGrid((4, 4), 0)
+    for ranges in ([None], [None, 4], [(2, 6), None], [None, -1]):
+        with pytest.raises(ValueError):
+            grid.window(ranges)
+
+
+def reference_summary(grid, block, func):
+    counts = {}
+    for i, coord in grid.coords():
+        key = tuple(c // b for c, b in zip(coord, block))
+        live, total = counts.get(key, (0, 0))
+        counts[key] = (live + bool(func(grid[i])), total + 1)
+    return counts
+
+
+@pytest.mark.parametrize('storage', ['list', pytest.param('numpy', marks=pytest.mark.skipif(np is None, reason='needs numpy'))])
+@pytest.mark.parametrize('func', [bool, lambda value: value % 3 == 0])
+def test_summary(storage, func):
+    size = (7, 5, 4)
+    grid = NGrid(size, [(i * 7919) % 5 for i in range(140)], storage)
+    block = (3, 2, 4)
+    summary = grid.summary(block, func)
+
+    assert summary.size == (3, 3, 1)
+    for key, (live, total) in reference_summary(grid, block, func).items():
+        assert summary[key] == pytest.approx(live / total)